@@ -1,5 +1,6 @@
 import subprocess
 import sys
+from importlib.metadata import version, PackageNotFoundError
 
 # Bibliotecas e suas versões mínimas/exatas desejadas
 # O formato é "biblioteca": "versao" ou "biblioteca": ">=versao"
@@ -17,29 +18,67 @@ required_libs = {
     "packaging": "24.0"  # Adicionada dependência para verificação de versão
 }
 
+def normalize_version_spec(target_version_spec):
+    """
+    Normaliza a especificação de versão: sem operador, é tratada como exata ("==versao").
+    Especificações compostas (ex: "<2.0,>=1.21.2") são mantidas como estão.
+    """
+    if target_version_spec.startswith((">=", "<=", "==", "!=", "<", ">", "~=")):
+        return target_version_spec
+    return f"=={target_version_spec}"
+
+
+def build_package_spec(lib, target_version_spec):
+    """Monta a especificação do pip para uma biblioteca ("lib==versao", "lib>=versao", ...)."""
+    return f"{lib}{normalize_version_spec(target_version_spec)}"
+
+
 def install_and_verify_libraries(libs):
     """
     Instala ou atualiza as bibliotecas listadas e verifica suas versões.
+    Todas as bibliotecas são instaladas numa única chamada do pip (um só processo Python e uma
+    só resolução de dependências). Se essa chamada falhar, instala uma a uma para que uma
+    especificação problemática não bloqueie as demais.
     """
     print("Iniciando a instalação/atualização de dependências...")
     all_installed_correctly = True
 
+    package_specs = [build_package_spec(lib, spec) for lib, spec in libs.items()]
+    try:
+        print(f"Instalando/Atualizando todas as bibliotecas de uma vez: {' '.join(package_specs)}")
+        # Usando apenas install, pois --upgrade com ==versao pode não fazer o downgrade se uma maior estiver instalada.
+        # pip install lib==versao irá instalar a versão exata, ou falhar se não for possível.
+        subprocess.check_call([sys.executable, "-m", "pip", "install", *package_specs])
+        print("Todas as bibliotecas foram instaladas/atualizadas com sucesso.")
+        print("-" * 30)
+    except subprocess.CalledProcessError as e:
+        print(f"AVISO: A instalação em lote falhou ({e}). Instalando cada biblioteca separadamente...")
+        print("-" * 30)
+        all_installed_correctly = install_libraries_individually(libs)
+    except Exception as e:
+        print(f"ERRO inesperado na instalação em lote: {e}")
+        all_installed_correctly = False
+
+    if all_installed_correctly:
+        print("\nTodas as dependências principais parecem ter sido instaladas/configuradas corretamente.")
+    else:
+        print("\nATENÇÃO: Algumas dependências não puderam ser instaladas/configuradas corretamente. Verifique os logs.")
+
+    print("\nVerificação de versões (após tentativa de instalação):")
+    verify_installed_versions(libs)
+
+
+def install_libraries_individually(libs):
+    """
+    Instala cada biblioteca numa chamada separada do pip (fallback da instalação em lote).
+    Retorna True se todas foram instaladas corretamente.
+    """
+    all_installed_correctly = True
     for lib, target_version_spec in libs.items():
         # Tenta instalar/atualizar a biblioteca
         try:
             print(f"Instalando/Atualizando {lib} (versão alvo: {target_version_spec})...")
-            # Usamos a versão exata para garantir consistência
-            # Se quiséssemos >= usaríamos f"{lib}>={target_version_spec}"
-            # Para exata, o pip install já entende "lib==versao"
-            if target_version_spec.startswith(">="):
-                 package_spec = f"{lib}{target_version_spec}"
-            else:
-                 package_spec = f"{lib}=={target_version_spec}"
-
-            # subprocess.check_call([sys.executable, "-m", "pip", "install", "--upgrade", package_spec])
-            # Usando apenas install, pois --upgrade com ==versao pode não fazer o downgrade se uma maior estiver instalada.
-            # pip install lib==versao irá instalar a versão exata, ou falhar se não for possível.
-            subprocess.check_call([sys.executable, "-m", "pip", "install", package_spec])
+            subprocess.check_call([sys.executable, "-m", "pip", "install", build_package_spec(lib, target_version_spec)])
             print(f"{lib} instalado/atualizado com sucesso para a especificação {target_version_spec}.")
 
         except subprocess.CalledProcessError as e:
@@ -49,79 +88,35 @@ def install_and_verify_libraries(libs):
             print(f"ERRO inesperado ao processar {lib}: {e}")
             all_installed_correctly = False
         print("-" * 30)
-
-    if all_installed_correctly:
-        print("\nTodas as dependências principais parecem ter sido instaladas/configuradas corretamente.")
-    else:
-        print("\nATENÇÃO: Algumas dependências não puderam ser instaladas/configuradas corretamente. Verifique os logs.")
-
-    print("\nVerificação de versões (após tentativa de instalação):")
-    verify_installed_versions(libs)
+    return all_installed_correctly
 
 
 def verify_installed_versions(libs_to_check):
     """
     Verifica as versões das bibliotecas instaladas usando packaging.version para comparações robustas.
+    As versões são lidas direto dos metadados instalados (importlib.metadata), sem chamar o pip.
     """
-    from packaging.version import parse as parse_version
-    try:
-        # Usar py -m pip para consistência com como o usuário está executando
-        installed_packages_raw = subprocess.check_output([sys.executable, "-m", "pip", "freeze"])
-        installed_packages = {}
-        for line in installed_packages_raw.decode().splitlines():
-            if '==' in line:
-                name, version = line.split('==', 1)
-                installed_packages[name.lower()] = version
-            # Poderia adicionar lógica para pacotes editáveis ou de URLs se necessário
-    except Exception as e:
-        print(f"Erro ao obter a lista de pacotes instalados: {e}")
-        return
+    from packaging.specifiers import SpecifierSet, InvalidSpecifier
+    from packaging.version import Version, InvalidVersion
 
     print("\nComparando versões instaladas com as requeridas:")
     for lib_name_req, target_version_spec_str in libs_to_check.items():
-        installed_version_str = installed_packages.get(lib_name_req.lower())
+        try:
+            installed_version_str = version(lib_name_req)
+        except PackageNotFoundError:
+            installed_version_str = None
         
         if installed_version_str:
-            installed_v = parse_version(installed_version_str)
-            
-            # Determinar operador e versão requerida
-            if target_version_spec_str.startswith(">="):
-                operator = ">="
-                required_v_str = target_version_spec_str[2:]
-            elif target_version_spec_str.startswith("=="):
-                operator = "=="
-                required_v_str = target_version_spec_str[2:]
-            elif target_version_spec_str.startswith("<="):
-                operator = "<="
-                required_v_str = target_version_spec_str[2:]
-            elif target_version_spec_str.startswith("<"):
-                operator = "<"
-                required_v_str = target_version_spec_str[1:]
-            elif target_version_spec_str.startswith(">"):
-                operator = ">"
-                required_v_str = target_version_spec_str[1:]
-            elif target_version_spec_str.startswith("!="):
-                operator = "!="
-                required_v_str = target_version_spec_str[2:]
-            else: # Assume correspondência exata se nenhum operador for especificado
-                operator = "=="
-                required_v_str = target_version_spec_str
-            
-            required_v = parse_version(required_v_str)
-            
-            match = False
-            if operator == ">=":
-                match = installed_v >= required_v
-            elif operator == "==":
-                match = installed_v == required_v
-            elif operator == "<=":
-                match = installed_v <= required_v
-            elif operator == "<":
-                match = installed_v < required_v
-            elif operator == ">":
-                match = installed_v > required_v
-            elif operator == "!=":
-                match = installed_v != required_v
+            # Um SpecifierSet por entrada: cobre todos os operadores e especificações compostas
+            try:
+                required_spec = SpecifierSet(normalize_version_spec(target_version_spec_str))
+                installed_v = Version(installed_version_str)
+            except (InvalidSpecifier, InvalidVersion) as e:
+                print(f"  {lib_name_req}: ATENÇÃO - Não foi possível comparar versões ({e})")
+                continue
+
+            # prereleases=True: uma versão pré-lançamento instalada ainda deve ser comparada
+            match = required_spec.contains(installed_v, prereleases=True)
             
             if match:
                 print(f"  {lib_name_req}: OK (Instalado: {installed_v}, Requerido: {target_version_spec_str})")
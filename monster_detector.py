@@ -1,26 +1,167 @@
-import cv2
+from __future__ import annotations
+
 import os
-import numpy as np
 from collections import defaultdict
 import time # Adicionado para controle de FPS no teste
 import shutil # Adicionado para limpar pasta de teste
+import json
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import logging
+
+# Mensagens do detector. O padrão do logging (WARNING) mantém o caminho de detecção silencioso;
+# o bloco __main__ configura INFO para o teste interativo.
+logger = logging.getLogger(__name__)
+
+# cv2 e numpy são importados sob demanda (ver _importar_dependencias): só importar este módulo,
+# sem instanciar o detector, não paga os ~200-400 ms de importação do OpenCV.
+cv2 = None
+np = None
+
+def _importar_dependencias():
+    """Importa cv2 e numpy no escopo do módulo na primeira vez em que forem necessários."""
+    global cv2, np
+    if cv2 is None:
+        import cv2 as _cv2
+        import numpy as _np
+        cv2, np = _cv2, _np
+
+# Trocado por numba.prange antes de compilar o kernel (em Python puro, prange é só range)
+_prange = range
+
+def _maximo_local(res, y, x):
+    """Indica se res[y, x] é maior ou igual a todos os vizinhos 3x3 (dentro do mapa)."""
+    altura, largura = res.shape
+    valor = res[y, x]
+    for vy in range(max(y - 1, 0), min(y + 2, altura)):
+        for vx in range(max(x - 1, 0), min(x + 2, largura)):
+            if res[vy, vx] > valor:
+                return False
+    return True
+
+def _picos_nms(res, threshold, w, h, max_picos):
+    """
+    Extração de picos com NMS para o kernel Numba (ver _obter_kernel_picos). Uma varredura do
+    mapa (linhas em paralelo na versão paralela) separa os máximos locais 3x3 acima do threshold;
+    em seguida eles são aceitos do mais forte para o mais fraco, descartando os que caem na
+    vizinhança de um pico já aceito, como no laço com cv2.minMaxLoc de
+    MonsterDetector._extrair_picos. Pontos que não são máximos locais (encostas de um pico já
+    suprimido) nunca viram candidatos.
+
+    Returns:
+        Array (N, 3) com (x, y, confianca) por pico, N <= max_picos.
+    """
+    altura, largura = res.shape
+    candidato = np.zeros((altura, largura), dtype=np.bool_)
+    contagem = np.zeros(altura + 1, dtype=np.int64)
+    for y in _prange(altura):
+        n_linha = 0
+        for x in range(largura):
+            if res[y, x] >= threshold and _maximo_local(res, y, x):
+                candidato[y, x] = True
+                n_linha += 1
+        contagem[y + 1] = n_linha
+    inicio = np.cumsum(contagem)
+
+    n = inicio[altura]
+    xs = np.empty(n, dtype=np.int64)
+    ys = np.empty(n, dtype=np.int64)
+    valores = np.empty(n, dtype=np.float32)
+    for y in _prange(altura):
+        if contagem[y + 1] == 0:
+            continue
+        k = inicio[y]
+        for x in range(largura):
+            if candidato[y, x]:
+                xs[k] = x
+                ys[k] = y
+                valores[k] = res[y, x]
+                k += 1
+
+    picos = np.empty((max_picos, 3), dtype=np.float64)
+    aceitos = 0
+    meio_w, meio_h = w // 2, h // 2
+    for idx in np.argsort(-valores):
+        if aceitos >= max_picos:
+            break
+        suprimido = False
+        for j in range(aceitos):
+            if abs(xs[idx] - picos[j, 0]) <= meio_w and abs(ys[idx] - picos[j, 1]) <= meio_h:
+                suprimido = True
+                break
+        if not suprimido:
+            picos[aceitos, 0] = xs[idx]
+            picos[aceitos, 1] = ys[idx]
+            picos[aceitos, 2] = valores[idx]
+            aceitos += 1
+    return picos[:aceitos]
+
+# Valor gravado no mapa de resposta sobre os picos já extraídos (abaixo de qualquer threshold)
+_VALOR_SUPRIMIDO = -3.0e38
+# Picos extraídos com cv2.minMaxLoc antes de passar para a extração com cv2.dilate, que custa
+# várias varreduras do mapa e só compensa quando o mapa tem muitos picos
+PICOS_MINMAXLOC = 8
+
+# Kernels Numba compilados de _picos_nms: {paralelo: função}. None = ainda não tentado,
+# False = numba indisponível.
+_kernels_picos = None
 
-# Tentativa de importação dos módulos de screen_capture
-try:
-    from screen_capture import MSSCapturer, select_and_configure_capture_region
-    SCREEN_CAPTURE_AVAILABLE = True
-except ImportError:
-    print("AVISO: Módulo 'screen_capture' não encontrado. O teste de integração com captura de tela será desabilitado.")
-    SCREEN_CAPTURE_AVAILABLE = False
-    # Definir classes e funções dummy para evitar erros no if __name__ se o import falhar
-    class MSSCapturer:
-        def __init__(self, monitor): pass
-        def get_frame(self): return None
-        def close(self): pass
-    def select_and_configure_capture_region(): return None, None, None
+def _obter_kernel_picos(paralelo: bool = False):
+    """
+    Compila _picos_nms com Numba (opcional) na primeira chamada. Retorna None sem numba.
+
+    Args:
+        paralelo: Se True, retorna a versão com parallel=True (linhas em prange). Só deve ser
+                  usada fora do pool de threads da detecção: a camada de threads padrão do
+                  numba (workqueue) não aceita kernels paralelos chamados de várias threads.
+    """
+    global _kernels_picos, _prange, _maximo_local
+    if _kernels_picos is None:
+        try:
+            from numba import njit, prange
+        except ImportError:
+            _kernels_picos = False
+        else:
+            _prange = prange
+            _maximo_local = njit(cache=True, nogil=True, inline="always")(_maximo_local)
+            # nogil: as threads do pool de detecção rodam a versão serial em paralelo
+            _kernels_picos = {
+                False: njit(cache=True, nogil=True)(_picos_nms),
+                True: njit(cache=True, nogil=True, parallel=True)(_picos_nms),
+            }
+    return _kernels_picos[paralelo] if _kernels_picos else None
+
+# Nome base dos arquivos de cache em disco dos templates (.npy com os pixels e .json com o índice),
+# gravados dentro da pasta de sprites
+CACHE_TEMPLATES_NOME = ".templates_cache"
+
+# Métodos de correlação suportados pelo detector:
+#   "ccoeff": cv2.matchTemplate com TM_CCOEFF_NORMED (aceita GPU)
+#   "ccorr":  TM_CCORR com templates já normalizados no carregamento e normalização do frame
+#             calculada uma vez por frame (imagens integrais) e por tamanho de template (só CPU).
+#             Produz o mesmo score do "ccoeff".
+#   "sqdiff": TM_SQDIFF direto nos uint8, sem normalização (só CPU). A confiança é
+#             1 - (diferença RMS / 255), que NÃO é comparável à dos outros métodos: não é
+#             invariante a brilho e fica alta em qualquer região de tons parecidos com o
+#             template, então precisa de um threshold bem mais alto (ver MonsterDetector)
+METODOS_MATCHING = ("ccoeff", "ccorr", "sqdiff")
+
+# Lado (px) das células da grade de ocupação usada para pular regiões já saturadas na detecção
+CELULA_OCUPACAO = 32
+# Lado (px) dos blocos comparados com o frame anterior na detecção incremental
+BLOCO_DIFERENCA = 32
+# Acima dessa fração da área do frame em regiões alteradas, o frame inteiro é reprocessado
+FRACAO_MAX_ALTERADA = 0.5
+# Peso de cada frame na média móvel exponencial da taxa de acerto dos templates
+ALFA_PRIORIDADE = 0.1
 
 class MonsterDetector:
-    def __init__(self, pasta_sprites: str):
+    def __init__(self, pasta_sprites: str, usar_gpu: bool = True, escala_piramide: float = 0.5,
+                 folga_piramide: float = 0.15, num_threads: int | None = None, usar_cache_disco: bool = True,
+                 max_picos_por_template: int = 50, usar_numba: bool = True, metodo: str = "auto",
+                 confianca_saturacao: float = 0.95, detectar_incremental: bool = True,
+                 limiar_diferenca: int = 0, usar_canal_verde: bool = False):
         """
         Inicializa o detector de monstros.
 
@@ -29,14 +170,278 @@ class MonsterDetector:
                            Cada subpasta deve ser nomeada com o nome do monstro e conter
                            arquivos PNG de seus sprites.
                            Ex: monster_sprites/Zombie/Zombie_A.png
+            usar_gpu: Se True, tenta usar CUDA (cv2.cuda) ou OpenCL (cv2.UMat) no matchTemplate.
+                      Sem suporte disponível, a detecção continua na CPU. Com GPU os templates
+                      rodam em série (sem o pool de threads). O uso de OpenCL é um estado global
+                      do OpenCV: fica ligado enquanto o detector existe e fechar() restaura o
+                      estado anterior. O backend escolhido é registrado no log.
+            escala_piramide: Menor escala do passo grosseiro da busca (0.25 = um quarto da
+                             resolução). Potências de 1/2 montam uma pirâmide gaussiana
+                             (cv2.pyrDown) e cada template usa o nível mais reduzido em que ainda
+                             tem pelo menos 8 px de lado; outras escalas usam um único nível
+                             (cv2.resize). Use 1.0 para buscar direto em resolução total.
+                             Em 0.25 a folga necessária para não perder sprites fora da fase da
+                             grade (ver folga_piramide) traz tantos candidatos que o refinamento
+                             custa mais do que o nível extra economiza; por isso o padrão é 0.5.
+            folga_piramide: Quanto o threshold é relaxado no passo grosseiro por nível de pirâmide
+                            (fator 2 de redução), já que a redução de escala diminui a correlação
+                            dos picos verdadeiros, mais ainda com o sprite fora da fase da grade
+                            reduzida: 0.15 vira 0.15 em 1/2 e 0.3 em 1/4.
+            num_threads: Número de threads para processar templates em paralelo na CPU
+                         (padrão: os.cpu_count()). Use 1 para desativar o paralelismo.
+            usar_cache_disco: Se True, guarda os templates decodificados num cache em disco dentro
+                              da pasta de sprites e o reaproveita enquanto os PNGs não mudarem.
+            max_picos_por_template: Máximo de detecções por template em cada frame (limita o
+                                    custo da extração de picos no pior caso).
+            usar_numba: Se True e o numba estiver instalado, a extração de picos usa um kernel
+                        compilado em vez do laço com cv2.minMaxLoc.
+            metodo: Método de correlação, um de METODOS_MATCHING, ou "auto" para usar "ccoeff"
+                    quando há backend de GPU e "ccorr" na CPU. Os métodos diferentes de
+                    "ccoeff" rodam só na CPU. Com "sqdiff" a confiança mede a diferença RMS dos
+                    pixels, não a correlação: thresholds como 0.7-0.8 aceitam boa parte de um
+                    frame de tons suaves, onde os outros métodos acham só o sprite. Use algo
+                    como 0.95 ou mais e confira com os seus sprites.
+            confianca_saturacao: Acima dessa confiança, a região da detecção é considerada
+                                 resolvida para aquele monstro e os próximos templates dele não
+                                 refinam candidatos na mesma célula da grade de ocupação.
+            detectar_incremental: Se True, compara cada frame com o anterior em blocos de
+                                  BLOCO_DIFERENCA px e só procura monstros nas regiões alteradas,
+                                  mantendo as detecções anteriores fora delas. Um frame idêntico
+                                  ao anterior reaproveita as detecções sem nenhum matchTemplate.
+            limiar_diferenca: Diferença de cinza (0-255) abaixo da qual um pixel é considerado
+                              igual ao do frame anterior na detecção incremental. 0 = qualquer
+                              mudança conta; valores como 8 ignoram ruído de captura/compressão.
+            usar_canal_verde: Se True, usa o canal verde como "cinza" (frames e templates), em vez
+                              da luminância do cv2.cvtColor: só copia um canal (~0.4 ms contra
+                              ~0.65 ms num frame 1080p). A correlação normalizada costuma tolerar
+                              bem a troca, mas confira os thresholds com os seus sprites.
         """
+        _importar_dependencias()
+
         self.pasta_sprites = pasta_sprites
         self.templates = {}  # Dicionário: {"NomeMonstro": [template1_img, template2_img, ...]}}
         self.template_filenames = {} # Dicionário: {"NomeMonstro": [filename1, filename2, ...]} para debug
+        self.templates_gray = {} # Dicionário: {"NomeMonstro": [template1_gray, ...]} usado na detecção
+        self.templates_gray_small = {} # Dicionário: {"NomeMonstro": [template1_gray_reduzido ou None, ...]}
+        self.templates_escala = {} # Dicionário: {"NomeMonstro": [escala do template1_gray_reduzido ou None, ...]}
+        self.templates_norm = {} # Dicionário: {"NomeMonstro": [template1_float32_normalizado, ...]} (metodo "ccorr")
+        self.templates_norm_small = {} # Idem para os templates reduzidos (None onde não há pirâmide)
+        self.templates_gpu = {} # Dicionário: {"NomeMonstro": [template1_umat/gpumat, ...]} (vazio na CPU)
+        self.escala_piramide = escala_piramide
+        self.folga_piramide = folga_piramide
+        self.usar_cache_disco = usar_cache_disco
+        self.max_picos_por_template = max_picos_por_template
+        self.confianca_saturacao = confianca_saturacao
+        # Taxa de acerto (média móvel exponencial) de cada template: {"NomeMonstro": [prioridade1, ...]}.
+        # Os templates de um monstro são testados da maior para a menor prioridade.
+        self._prioridade = {}
+        self.detectar_incremental = detectar_incremental
+        self.limiar_diferenca = limiar_diferenca
+        self.usar_canal_verde = usar_canal_verde
+        # Estado da detecção incremental: frame em cinza, parâmetros e detecções da última chamada
+        self._frame_gray_anterior = None
+        self._chave_anterior = None
+        self._deteccoes_anteriores = []
+        # Buffers do frame em cinza, alternados a cada chamada (o anterior fica intacto para a
+        # detecção incremental), e do frame inteiro reduzido da pirâmide. Alocados no primeiro frame.
+        self._buffers_cinza = [None, None]
+        self._indice_cinza = 0
+        self._buffers_piramide = {} # {escala: buffer do frame inteiro reduzido}
+        if metodo != "auto" and metodo not in METODOS_MATCHING:
+            logger.warning("AVISO: Método de matching desconhecido: %s. Usando 'auto'. Opções: %s", metodo, METODOS_MATCHING)
+            metodo = "auto"
+
         self._cache_loaded = False
+
+        self._backend_gpu = None # "cuda", "opencl" ou None (CPU)
+        self._cuda_matcher = None # Reutilizado entre templates e frames no backend CUDA
+        self._opencl_anterior = None # cv2.ocl.useOpenCL() antes deste detector ligá-lo (restaurado em fechar)
+        self._configurar_backend_gpu(usar_gpu and metodo in ("auto", "ccoeff"))
+        if metodo == "auto":
+            metodo = "ccoeff" if self._backend_gpu else "ccorr"
+        self.metodo = metodo
+
+        # Buffers de resultado do matchTemplate reaproveitados entre frames, um conjunto por thread
+        # (cada worker do pool escreve só nos seus): {(altura_res, largura_res): array float32}
+        self._buffers_locais = threading.local()
+
+        # Pool persistente entre frames: o cv2.matchTemplate libera o GIL, então os templates
+        # rodam em paralelo de verdade. Só na CPU, já que o matcher CUDA e a fila OpenCL
+        # não são compartilháveis entre threads com segurança.
+        num_threads = num_threads or os.cpu_count() or 1
+        self._pool = None
+        if not self._backend_gpu and num_threads > 1:
+            self._pool = ThreadPoolExecutor(max_workers=num_threads, thread_name_prefix="MonsterDetector")
+        if self._backend_gpu:
+            logger.info("Detecção acelerada habilitada (backend: %s, método: %s); templates em série, sem o pool de threads.",
+                        self._backend_gpu, self.metodo)
+        else:
+            logger.info("Detecção na CPU (método: %s, %d thread(s)).", self.metodo, num_threads if self._pool else 1)
+
+        # Compila o kernel de picos já na inicialização para não travar o primeiro frame. Sem o
+        # pool, a extração roda numa thread só e pode usar a versão paralela do kernel.
+        self._kernel_picos = _obter_kernel_picos(paralelo=self._pool is None) if usar_numba else None
+        if self._kernel_picos is not None:
+            self._kernel_picos(np.zeros((2, 2), dtype=np.float32), np.float32(1.0), 1, 1, 1)
         
         self.carregar_templates()
 
+    def fechar(self):
+        """Libera o pool de threads da detecção e restaura o estado do OpenCL do OpenCV."""
+        if self._pool:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+        if self._opencl_anterior is not None:
+            cv2.ocl.setUseOpenCL(self._opencl_anterior)
+            self._opencl_anterior = None
+
+    def _configurar_backend_gpu(self, usar_gpu: bool):
+        """
+        Escolhe o backend acelerado para o matchTemplate: CUDA se o OpenCV foi compilado com
+        suporte e há uma GPU disponível, senão OpenCL via cv2.UMat, senão CPU.
+        """
+        if not usar_gpu:
+            return
+
+        try:
+            if hasattr(cv2, "cuda") and cv2.cuda.getCudaEnabledDeviceCount() > 0:
+                self._cuda_matcher = cv2.cuda.createTemplateMatching(cv2.CV_8UC1, cv2.TM_CCOEFF_NORMED)
+                self._backend_gpu = "cuda"
+        except cv2.error as e:
+            logger.warning("AVISO: CUDA indisponível para o matchTemplate: %s", e)
+            self._cuda_matcher = None
+
+        if self._backend_gpu is None and cv2.ocl.haveOpenCL():
+            # setUseOpenCL vale para o processo todo: guarda o estado anterior para fechar()
+            anterior = cv2.ocl.useOpenCL()
+            cv2.ocl.setUseOpenCL(True)
+            if cv2.ocl.useOpenCL():
+                self._backend_gpu = "opencl"
+                self._opencl_anterior = anterior
+            else:
+                cv2.ocl.setUseOpenCL(anterior)
+
+    def _enviar_para_gpu(self, img: np.ndarray):
+        """Copia uma imagem para a memória do backend ativo (GpuMat/UMat) ou a retorna intacta na CPU."""
+        if self._backend_gpu == "cuda":
+            img_gpu = cv2.cuda_GpuMat()
+            img_gpu.upload(img)
+            return img_gpu
+        if self._backend_gpu == "opencl":
+            return cv2.UMat(img)
+        return img
+
+    def _preparar_frame(self, frame_gray: np.ndarray):
+        """
+        Prepara o frame em cinza para o método/backend ativo, uma vez por frame: envia para a GPU
+        no "ccoeff" ou calcula as imagens integrais (soma e soma dos quadrados) no "ccorr".
+        """
+        if self.metodo == "ccorr":
+            # O espectro do frame não é compartilhado entre templates: uma DFT do frame inteiro
+            # custa mulSpectrums + idft por template (~6 ms a 960x540), mais que o TM_CCORR do
+            # OpenCV, que já usa DFT em blocos do tamanho do template (~2.5 ms)
+            soma, soma_q = cv2.integral2(frame_gray, sdepth=cv2.CV_64F, sqdepth=cv2.CV_64F)
+            return {"f32": frame_gray.astype(np.float32), "soma": soma, "soma_q": soma_q, "denominadores": {}}
+        return self._enviar_para_gpu(frame_gray)
+
+    def _normalizar_template(self, template_gray: np.ndarray | None) -> np.ndarray | None:
+        """Template float32 com média zero e norma 1, usado pelo método "ccorr"."""
+        if template_gray is None:
+            return None
+        template_norm = template_gray.astype(np.float32)
+        template_norm -= template_norm.mean()
+        norma = float(np.linalg.norm(template_norm))
+        if norma > 1e-6: # Template de cor única não tem norma; o score fica 0 em todo o frame
+            template_norm /= norma
+        return template_norm
+
+    def _denominador_janela(self, dados_frame: dict, h: int, w: int) -> np.ndarray:
+        """
+        Norma do frame sem a média, para cada janela h x w, a partir das imagens integrais.
+        Calculada uma vez por frame e por tamanho de template (templates do mesmo tamanho a
+        compartilham). Corrida entre threads só faz a mesma conta duas vezes.
+        """
+        denominador = dados_frame["denominadores"].get((h, w))
+        if denominador is None:
+            soma, soma_q = dados_frame["soma"], dados_frame["soma_q"]
+            soma_janela = soma[h:, w:] - soma[:-h, w:] - soma[h:, :-w] + soma[:-h, :-w]
+            soma_q_janela = soma_q[h:, w:] - soma_q[:-h, w:] - soma_q[h:, :-w] + soma_q[:-h, :-w]
+            variancia = soma_q_janela - soma_janela * soma_janela / (h * w)
+            # Janelas de cor única têm variância ~0; o piso evita divisão por zero (score ~0)
+            denominador = np.sqrt(np.maximum(variancia, 1.0)).astype(np.float32)
+            dados_frame["denominadores"][(h, w)] = denominador
+        return denominador
+
+    def _match_template(self, frame_dev, template_dev, limiar: float | None = None) -> np.ndarray | None:
+        """
+        Executa o cv2.matchTemplate no backend/método ativo e retorna o mapa de resposta
+        (score do TM_CCOEFF_NORMED, ou -SSD no "sqdiff") como array NumPy. Na GPU, se limiar for dado, o máximo do
+        mapa é calculado no próprio dispositivo e o mapa só é baixado se algum ponto atingir o
+        limiar; senão retorna None.
+        """
+        if self.metodo == "sqdiff":
+            forma_res = (frame_dev.shape[0] - template_dev.shape[0] + 1, frame_dev.shape[1] - template_dev.shape[1] + 1)
+            res = cv2.matchTemplate(frame_dev, template_dev, cv2.TM_SQDIFF, result=self._buffer_resultado(forma_res))
+            # Negado para que, como nos outros métodos, maior seja melhor (ver _limiar_resposta)
+            return np.negative(res, out=res)
+        if self.metodo == "ccorr":
+            # Com o template de média zero e norma 1, TM_CCORR dá o numerador do TM_CCOEFF_NORMED;
+            # falta só dividir pela norma de cada janela do frame
+            h, w = template_dev.shape
+            frame_f32 = frame_dev["f32"]
+            forma_res = (frame_f32.shape[0] - h + 1, frame_f32.shape[1] - w + 1)
+            res = cv2.matchTemplate(frame_f32, template_dev, cv2.TM_CCORR, result=self._buffer_resultado(forma_res))
+            res /= self._denominador_janela(frame_dev, h, w)
+            return res
+        if self._backend_gpu == "cuda":
+            res_gpu = self._cuda_matcher.match(frame_dev, template_dev)
+            if limiar is not None and cv2.cuda.minMax(res_gpu)[1] < limiar:
+                return None
+            return res_gpu.download()
+        if self._backend_gpu == "opencl":
+            res_umat = cv2.matchTemplate(frame_dev, template_dev, cv2.TM_CCOEFF_NORMED)
+            if limiar is not None and cv2.minMaxLoc(res_umat)[1] < limiar:
+                return None
+            return res_umat.get()
+        forma_res = (frame_dev.shape[0] - template_dev.shape[0] + 1, frame_dev.shape[1] - template_dev.shape[1] + 1)
+        return cv2.matchTemplate(frame_dev, template_dev, cv2.TM_CCOEFF_NORMED,
+                                 result=self._buffer_resultado(forma_res))
+
+    def _match_roi(self, roi_gray: np.ndarray, template_gray: np.ndarray) -> np.ndarray:
+        """Mapa de resposta numa ROI pequena do frame (refinamento), na mesma escala de _match_template."""
+        if self.metodo == "sqdiff":
+            return np.negative(cv2.matchTemplate(roi_gray, template_gray, cv2.TM_SQDIFF))
+        return cv2.matchTemplate(roi_gray, template_gray, cv2.TM_CCOEFF_NORMED)
+
+    def _limiar_resposta(self, threshold: float, h: int, w: int) -> float:
+        """
+        Converte o threshold de confiança para a escala do mapa de resposta do método ativo.
+        No "sqdiff", confiança >= threshold equivale a SSD <= (1 - threshold)² * h * w * 255².
+        """
+        if self.metodo == "sqdiff":
+            return -((1.0 - threshold) ** 2) * h * w * 255.0 ** 2
+        return threshold
+
+    def _confianca(self, valor: float, h: int, w: int) -> float:
+        """Converte um valor do mapa de resposta em confiança (inverso de _limiar_resposta)."""
+        if self.metodo == "sqdiff":
+            return 1.0 - float(np.sqrt(max(-valor, 0.0) / (h * w * 255.0 ** 2)))
+        return float(valor)
+
+    def _buffer_resultado(self, forma: tuple[int, int]) -> np.ndarray:
+        """
+        Retorna o buffer float32 da thread atual para um mapa de resposta com essa forma,
+        alocando-o só na primeira vez. O conteúdo é sobrescrito pelo próximo matchTemplate
+        da mesma thread, então deve ser consumido antes disso.
+        """
+        buffers = getattr(self._buffers_locais, "por_forma", None)
+        if buffers is None:
+            buffers = self._buffers_locais.por_forma = {}
+        buffer = buffers.get(forma)
+        if buffer is None:
+            buffer = buffers[forma] = np.empty(forma, dtype=np.float32)
+        return buffer
+
     def carregar_templates(self, forcar_recarregar: bool = False):
         """
         Carrega todos os arquivos PNG das subpastas de monstros na pasta de sprites especificada.
@@ -44,156 +449,712 @@ class MonsterDetector:
         Implementa um cache simples para evitar recarregamentos desnecessários.
 
         Args:
-            forcar_recarregar: Se True, ignora o cache e recarrega todos os templates.
+            forcar_recarregar: Se True, ignora os caches (em memória e em disco) e decodifica
+                               todos os PNGs de novo; o cache em disco é regravado em seguida.
+                               Útil quando um sprite foi editado sem mudar mtime nem tamanho.
         """
         if self._cache_loaded and not forcar_recarregar:
-            print("Templates já carregados do cache.")
+            logger.info("Templates já carregados do cache.")
             return
 
-        print(f"Carregando templates da pasta principal de sprites: {self.pasta_sprites}...")
+        logger.info("Carregando templates da pasta principal de sprites: %s...", self.pasta_sprites)
         
         loaded_templates = defaultdict(list)
         loaded_filenames = defaultdict(list)
 
         if not os.path.isdir(self.pasta_sprites):
-            print(f"ERRO: Pasta principal de sprites '{self.pasta_sprites}' não encontrada.")
+            logger.error("ERRO: Pasta principal de sprites '%s' não encontrada.", self.pasta_sprites)
             self._cache_loaded = False
             self.templates = {}
             self.template_filenames = {}
+            self.templates_gray = {}
+            self.templates_gray_small = {}
+            self.templates_escala = {}
+            self.templates_norm = {}
+            self.templates_norm_small = {}
+            self.templates_gpu = {}
+            self._prioridade = {}
             return
 
-        for nome_pasta_monstro in os.listdir(self.pasta_sprites):
-            caminho_pasta_monstro = os.path.join(self.pasta_sprites, nome_pasta_monstro)
-            
-            if os.path.isdir(caminho_pasta_monstro):
-                nome_base_monstro = nome_pasta_monstro # Nome da subpasta é o nome do monstro
-                print(f"  Analisando pasta do monstro: '{nome_base_monstro}' em '{caminho_pasta_monstro}'")
-                
-                arquivos_png_encontrados = 0
-                for nome_arquivo_sprite in os.listdir(caminho_pasta_monstro):
-                    if nome_arquivo_sprite.lower().endswith(".png"):
-                        caminho_completo_sprite = os.path.join(caminho_pasta_monstro, nome_arquivo_sprite)
-                        try:
-                            template_img = cv2.imread(caminho_completo_sprite, cv2.IMREAD_COLOR) 
-                            
-                            if template_img is None:
-                                print(f"    AVISO: Não foi possível carregar a imagem: {caminho_completo_sprite}")
-                                continue
-                            
-                            loaded_templates[nome_base_monstro].append(template_img)
-                            # Armazenar apenas o nome do arquivo para template_filenames, para consistência com a saída
-                            loaded_filenames[nome_base_monstro].append(nome_arquivo_sprite) 
-                            print(f"      Template carregado: '{nome_arquivo_sprite}' para o monstro '{nome_base_monstro}'")
-                            arquivos_png_encontrados +=1
-
-                        except Exception as e:
-                            print(f"    ERRO ao carregar o template '{nome_arquivo_sprite}' de '{caminho_pasta_monstro}': {e}")
-                if arquivos_png_encontrados == 0:
-                    print(f"    AVISO: Nenhum arquivo PNG encontrado na pasta do monstro '{nome_base_monstro}'.")
-            # else: (opcional)
-            #     print(f"  Item ignorado (não é uma pasta): {nome_pasta_monstro}")
+        sprites = self._listar_sprites()
+        chave_cache = self._calcular_chave_cache(sprites) if self.usar_cache_disco else None
+
+        cache = self._ler_cache_disco(chave_cache) if chave_cache and not forcar_recarregar else None
+        if cache:
+            loaded_templates, loaded_filenames = cache
+            logger.info("  Templates carregados do cache em disco (nenhum PNG foi alterado).")
+        else:
+            imagens = self._decodificar_sprites([caminho for _, _, caminho in sprites])
+            for (nome_base_monstro, nome_arquivo_sprite, caminho_completo_sprite), (template_img, erro) in zip(sprites, imagens):
+                if erro is not None:
+                    logger.error("    ERRO ao carregar o template '%s': %s", caminho_completo_sprite, erro)
+                    continue
+                if template_img is None:
+                    logger.warning("    AVISO: Não foi possível carregar a imagem: %s", caminho_completo_sprite)
+                    continue
+
+                loaded_templates[nome_base_monstro].append(template_img)
+                # Armazenar apenas o nome do arquivo para template_filenames, para consistência com a saída
+                loaded_filenames[nome_base_monstro].append(nome_arquivo_sprite) 
+                logger.debug("      Template carregado: '%s' para o monstro '%s'", nome_arquivo_sprite, nome_base_monstro)
+
+            if chave_cache:
+                # Solta as views do cache anterior (mapeado em memória) antes de substituir o .npy
+                self.templates = {}
+                self._gravar_cache_disco(chave_cache, loaded_templates, loaded_filenames)
         
         self.templates = dict(loaded_templates)
         self.template_filenames = dict(loaded_filenames)
+        # A detecção é feita em escala de cinza: 1/3 dos bytes por correlação em relação ao BGR
+        self.templates_gray = {
+            nome: [self._cinza(t) for t in lista]
+            for nome, lista in self.templates.items()
+        }
+        self.templates_escala = {
+            nome: [self._escala_template(t) for t in lista]
+            for nome, lista in self.templates_gray.items()
+        }
+        self.templates_gray_small = {
+            nome: [self._reduzir(t, e) if e is not None else None for t, e in zip(lista, self.templates_escala[nome])]
+            for nome, lista in self.templates_gray.items()
+        }
+        if self.metodo == "ccorr":
+            self.templates_norm = {
+                nome: [self._normalizar_template(t) for t in lista]
+                for nome, lista in self.templates_gray.items()
+            }
+            self.templates_norm_small = {
+                nome: [self._normalizar_template(t) for t in lista]
+                for nome, lista in self.templates_gray_small.items()
+            }
+        else:
+            self.templates_norm = {}
+            self.templates_norm_small = {}
+        # Envia os templates do primeiro passo uma única vez para a GPU; reaproveitados em todos os frames
+        self.templates_gpu = {
+            nome: [self._enviar_para_gpu(t_small if t_small is not None else t_gray)
+                   for t_gray, t_small in zip(self.templates_gray[nome], self.templates_gray_small[nome])]
+            for nome in self.templates_gray
+        } if self._backend_gpu else {}
+        self._prioridade = {nome: [0.0] * len(lista) for nome, lista in self.templates_gray.items()}
+        self._frame_gray_anterior = None
         
         if not self.templates:
-            print("Nenhum template foi carregado. Verifique as subpastas de monstros e os arquivos PNG dentro delas.")
+            logger.warning("Nenhum template foi carregado. Verifique as subpastas de monstros e os arquivos PNG dentro delas.")
         else:
-            print(f"Total de {sum(len(v) for v in self.templates.values())} templates carregados para {len(self.templates)} tipos de monstros.")
-            for nome_monstro, sprites in self.templates.items():
-                print(f"  - Monstro '{nome_monstro}': {len(sprites)} sprite(s)")
+            logger.info("Total de %d templates carregados para %d tipos de monstros.",
+                        sum(len(v) for v in self.templates.values()), len(self.templates))
+            if logger.isEnabledFor(logging.DEBUG):
+                for nome_monstro, sprites in self.templates.items():
+                    logger.debug("  - Monstro '%s': %d sprite(s)", nome_monstro, len(sprites))
                 # for i, filename in enumerate(self.template_filenames[nome_monstro]):
                 # print(f"    - Sprite {i+1}: {filename}")
 
 
         self._cache_loaded = True
 
-    def detectar_monstros(self, frame: np.ndarray, threshold: float = 0.8, monstros_alvo: list[str] | None = None) -> list:
+    @staticmethod
+    def _decodificar_sprites(caminhos: list[str]) -> list[tuple]:
+        """
+        Decodifica os PNGs em paralelo (o cv2.imread libera o GIL durante a decodificação), com
+        até min(8, os.cpu_count()) threads. Sem conseguir criar o pool, decodifica em série.
+
+        Returns:
+            Lista de (imagem ou None, exceção ou None), na mesma ordem de caminhos.
+        """
+        def ler(caminho):
+            try:
+                return cv2.imread(caminho, cv2.IMREAD_COLOR), None
+            except Exception as e:
+                return None, e
+
+        num_threads = min(8, os.cpu_count() or 1, len(caminhos))
+        if num_threads > 1:
+            try:
+                with ThreadPoolExecutor(max_workers=num_threads, thread_name_prefix="MonsterDetectorLoad") as pool:
+                    return list(pool.map(ler, caminhos))
+            except RuntimeError as e:
+                logger.warning("  AVISO: Não foi possível decodificar os sprites em paralelo: %s", e)
+        return [ler(caminho) for caminho in caminhos]
+
+    def _listar_sprites(self) -> list[tuple[str, str, str]]:
+        """
+        Percorre as subpastas de monstros e lista os sprites PNG encontrados.
+
+        Returns:
+            Lista de (nome_monstro, nome_arquivo, caminho_completo).
+        """
+        sprites = []
+        # os.scandir devolve o tipo de cada entrada junto com a listagem (sem um stat extra por
+        # entrada no Windows) e o caminho completo já montado
+        with os.scandir(self.pasta_sprites) as entradas_monstros:
+            for entrada_monstro in entradas_monstros:
+                if not entrada_monstro.is_dir():
+                    continue
+                nome_base_monstro = entrada_monstro.name # Nome da subpasta é o nome do monstro
+                logger.debug("  Analisando pasta do monstro: '%s' em '%s'", nome_base_monstro, entrada_monstro.path)
+
+                arquivos_png_encontrados = 0
+                with os.scandir(entrada_monstro.path) as entradas_sprites:
+                    for entrada_sprite in entradas_sprites:
+                        if entrada_sprite.name.lower().endswith(".png") and entrada_sprite.is_file():
+                            sprites.append((nome_base_monstro, entrada_sprite.name, entrada_sprite.path))
+                            arquivos_png_encontrados += 1
+                if arquivos_png_encontrados == 0:
+                    logger.warning("    AVISO: Nenhum arquivo PNG encontrado na pasta do monstro '%s'.", nome_base_monstro)
+        return sprites
+
+    def _calcular_chave_cache(self, sprites: list[tuple[str, str, str]]) -> str:
+        """Gera a chave do cache em disco a partir do nome, mtime e tamanho de cada sprite."""
+        assinatura = []
+        for nome_monstro, nome_arquivo, caminho in sprites:
+            try:
+                info = os.stat(caminho)
+            except OSError:
+                continue
+            assinatura.append((nome_monstro, nome_arquivo, info.st_mtime_ns, info.st_size))
+        return hashlib.sha1(repr(sorted(assinatura)).encode("utf-8")).hexdigest()
+
+    def _ler_cache_disco(self, chave: str) -> tuple[dict, dict] | None:
+        """
+        Lê o cache em disco se ele corresponder à chave atual. Os pixels são mapeados em memória
+        (np.load com mmap_mode) e cada template é uma view do buffer, sem decodificar PNGs.
+
+        Returns:
+            (templates, filenames) no mesmo formato de carregar_templates, ou None se o cache
+            não existir, estiver desatualizado ou corrompido.
+        """
+        caminho_base = os.path.join(self.pasta_sprites, CACHE_TEMPLATES_NOME)
+        try:
+            with open(caminho_base + ".json", "r", encoding="utf-8") as f:
+                indice = json.load(f)
+            if not isinstance(indice, dict):
+                raise ValueError("o índice não é um objeto JSON")
+            if indice.get("chave") != chave:
+                return None
+            buffer = np.load(caminho_base + ".npy", mmap_mode="r")
+            # Um .npy trocado sem o .json correspondente (gravação interrompida) não bate com o índice
+            if indice["templates"]:
+                ultima = indice["templates"][-1]
+                if buffer.size != ultima["offset"] + int(np.prod(ultima["forma"])):
+                    raise ValueError("o .npy não corresponde ao índice")
+
+            templates = defaultdict(list)
+            filenames = defaultdict(list)
+            for entrada in indice["templates"]:
+                forma = tuple(entrada["forma"])
+                inicio = entrada["offset"]
+                fim = inicio + int(np.prod(forma))
+                templates[entrada["nome"]].append(buffer[inicio:fim].reshape(forma))
+                filenames[entrada["nome"]].append(entrada["arquivo"])
+            return templates, filenames
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            if not isinstance(e, FileNotFoundError):
+                logger.warning("  AVISO: Cache de templates inválido, recarregando os PNGs: %s", e)
+            return None
+
+    def _gravar_cache_disco(self, chave: str, templates: dict, filenames: dict):
+        """
+        Grava os templates num único .npy contíguo e o índice (nomes, formas, offsets) num .json.
+        Os dois são escritos com nomes temporários e só então trocados com os.replace, o .npy
+        antes e o .json por último: uma falha no meio (ex.: no Windows o .npy antigo não pode ser
+        substituído enquanto estiver mapeado em memória) nunca deixa um índice sem os dados.
+        """
+        caminho_base = os.path.join(self.pasta_sprites, CACHE_TEMPLATES_NOME)
+        entradas = []
+        partes = []
+        offset = 0
+        for nome_monstro, lista_templates in templates.items():
+            for nome_arquivo, template_img in zip(filenames[nome_monstro], lista_templates):
+                entradas.append({
+                    "nome": nome_monstro,
+                    "arquivo": nome_arquivo,
+                    "forma": list(template_img.shape),
+                    "offset": offset
+                })
+                partes.append(template_img.ravel())
+                offset += template_img.size
+
+        temporarios = (caminho_base + ".npy.tmp", caminho_base + ".json.tmp")
+        try:
+            with open(temporarios[0], "wb") as f:
+                np.save(f, np.concatenate(partes) if partes else np.empty(0, dtype=np.uint8))
+            with open(temporarios[1], "w", encoding="utf-8") as f:
+                json.dump({"chave": chave, "templates": entradas}, f)
+            os.replace(temporarios[0], caminho_base + ".npy")
+            os.replace(temporarios[1], caminho_base + ".json")
+        except (OSError, ValueError) as e:
+            logger.warning("  AVISO: Não foi possível gravar o cache de templates: %s", e)
+            for temporario in temporarios:
+                try:
+                    os.remove(temporario)
+                except OSError:
+                    pass
+
+    def _escalas_piramide(self) -> list[float]:
+        """Escalas dos níveis da pirâmide, da maior para a menor (vazia sem pirâmide)."""
+        if self.escala_piramide >= 1.0:
+            return []
+        niveis = np.log2(1.0 / self.escala_piramide)
+        if not np.isclose(niveis, round(niveis)):
+            return [self.escala_piramide]
+        return [0.5 ** n for n in range(1, int(round(niveis)) + 1)]
+
+    def _limiar_grosseiro(self, threshold: float, escala: float) -> float:
+        """
+        Threshold do passo grosseiro na escala dada: folga_piramide a menos por nível de redução.
+        A correlação de um sprite deslocado meio pixel da grade reduzida cai mais a cada nível.
+        """
+        return threshold - self.folga_piramide * float(np.log2(1.0 / escala))
+
+    def _escala_template(self, template_gray: np.ndarray) -> float | None:
+        """
+        Escala do passo grosseiro para o template: o nível mais reduzido da pirâmide em que ele
+        ainda tem pelo menos 8 px de lado, ou None (busca direta em resolução total) se nem o
+        primeiro nível servir para uma correlação confiável.
+        """
+        escolhida = None
+        for escala in self._escalas_piramide():
+            if min(template_gray.shape) * escala < 8:
+                break
+            escolhida = escala
+        return escolhida
+
+    @staticmethod
+    def _reduzir(imagem: np.ndarray, escala: float) -> np.ndarray:
+        """
+        Reduz a imagem para a escala: com cv2.pyrDown (filtro gaussiano + decimação, que preserva
+        melhor os picos de correlação) em escalas 1/2, 1/4, ...; senão com cv2.resize INTER_AREA.
+        """
+        niveis = np.log2(1.0 / escala)
+        if np.isclose(niveis, round(niveis)):
+            for _ in range(int(round(niveis))):
+                imagem = cv2.pyrDown(imagem)
+            return imagem
+        return cv2.resize(imagem, None, fx=escala, fy=escala, interpolation=cv2.INTER_AREA)
+
+    def _refinar_candidatos(self, frame_gray: np.ndarray, template_gray: np.ndarray, template_small: np.ndarray,
+                            escala: float, res_small: np.ndarray, threshold: float,
+                            ocupacao: np.ndarray | None = None) -> list[tuple[int, int, float]]:
+        """
+        Refina em resolução total os candidatos do passo grosseiro. Para cada candidato, roda o
+        matchTemplate apenas numa pequena ROI ao redor da posição projetada no frame original.
+        Candidatos cujo centro cai numa célula saturada de ocupacao são descartados sem refinar.
+
+        Returns:
+            Lista de (x, y, confianca) em coordenadas do frame original.
+        """
+        h, w = template_gray.shape
+        frame_h, frame_w = frame_gray.shape
+        h_small, w_small = template_small.shape
+        margem = int(np.ceil(1.0 / escala)) + 2
+
+        # Os candidatos já saem do passo grosseiro com NMS aplicado (um por pico)
+        candidatos = self._extrair_picos(res_small, self._limiar_resposta(self._limiar_grosseiro(threshold, escala),
+                                                                          h_small, w_small), w_small, h_small)
+        pontos = []
+        for x_small, y_small, _ in candidatos:
+            cx = int(round(x_small / escala))
+            cy = int(round(y_small / escala))
+            if ocupacao is not None and self._celula_saturada(ocupacao, cx, cy, w, h):
+                continue
+
+            x0, y0 = max(cx - margem, 0), max(cy - margem, 0)
+            x1, y1 = min(cx + margem, frame_w - w), min(cy + margem, frame_h - h)
+            if x1 < x0 or y1 < y0:
+                continue
+
+            res = self._match_roi(frame_gray[y0:y1 + h, x0:x1 + w], template_gray)
+            _, valor, _, (rx, ry) = cv2.minMaxLoc(res)
+            confianca = self._confianca(valor, h, w)
+            if confianca >= threshold:
+                pontos.append((x0 + rx, y0 + ry, confianca))
+
+        return pontos
+
+    def _extrair_picos(self, res: np.ndarray, threshold: float, w: int, h: int) -> list[tuple[int, int, float]]:
+        """
+        Extrai os picos do mapa de resposta com Non-Maximum Suppression numa vizinhança do
+        tamanho do template (±w//2, ±h//2), limitado a max_picos_por_template picos. Com numba
+        disponível, usa o kernel compilado (_picos_nms). Senão, os primeiros PICOS_MINMAXLOC
+        picos saem de um laço com cv2.minMaxLoc (pega o máximo, suprime a vizinhança e repete),
+        o que resolve o caso comum (nenhum ou poucos monstros) com poucas varreduras; se ainda
+        houver pontos acima do threshold, os demais candidatos são os máximos da vizinhança
+        obtidos com um único cv2.dilate, aceitos do mais forte para o mais fraco. Modifica res.
+
+        Returns:
+            Lista de (x, y, confianca), do pico mais forte para o mais fraco.
+        """
+        if self._kernel_picos is not None:
+            if cv2.minMaxLoc(res)[1] < threshold:
+                return []
+            picos = self._kernel_picos(res, np.float32(threshold), w, h, self.max_picos_por_template)
+            return [(int(x), int(y), float(confianca)) for x, y, confianca in picos]
+
+        meio_w, meio_h = w // 2, h // 2
+        picos = []
+        for _ in range(min(self.max_picos_por_template, PICOS_MINMAXLOC)):
+            _, max_val, _, (x, y) = cv2.minMaxLoc(res)
+            if max_val < threshold:
+                return picos
+            picos.append((x, y, float(max_val)))
+            cv2.rectangle(res, (x - meio_w, y - meio_h), (x + meio_w, y + meio_h), _VALOR_SUPRIMIDO, thickness=-1)
+        if len(picos) >= self.max_picos_por_template:
+            return picos
+
+        # Muitos picos: as vizinhanças dos já aceitos estão suprimidas em res, então basta
+        # procurar os máximos de vizinhança restantes
+        vizinhanca = cv2.getStructuringElement(cv2.MORPH_RECT, (2 * meio_w + 1, 2 * meio_h + 1))
+        ys, xs = np.nonzero((res >= threshold) & (res == cv2.dilate(res, vizinhanca)))
+        valores = res[ys, xs]
+        ordem = np.argsort(-valores, kind="stable")
+        xs, ys, valores = xs[ordem], ys[ordem], valores[ordem]
+
+        # Aceita do mais forte para o mais fraco; um platô (valores iguais na mesma
+        # vizinhança) vira um só pico
+        restantes = np.ones(len(valores), dtype=bool)
+        while len(picos) < self.max_picos_por_template:
+            livres = np.flatnonzero(restantes)
+            if not len(livres):
+                break
+            k = livres[0]
+            picos.append((int(xs[k]), int(ys[k]), float(valores[k])))
+            restantes &= (np.abs(xs - xs[k]) > meio_w) | (np.abs(ys - ys[k]) > meio_h)
+        return picos
+
+    @staticmethod
+    def _celula_saturada(ocupacao: np.ndarray, x: int, y: int, w: int, h: int) -> bool:
+        """Indica se o centro da região (x, y, w, h) cai numa célula saturada da grade de ocupação."""
+        linha = min((y + h // 2) // CELULA_OCUPACAO, ocupacao.shape[0] - 1)
+        coluna = min((x + w // 2) // CELULA_OCUPACAO, ocupacao.shape[1] - 1)
+        return bool(ocupacao[linha, coluna])
+
+    def _detectar_monstro(self, nome_monstro: str, indices: list[int], frame_gray: np.ndarray,
+                          frame_dev, frames_dev_small, threshold: float) -> list[tuple[int, list]]:
+        """
+        Procura os templates de um monstro em sequência, do mais para o menos provável (ver
+        self._prioridade). Cada detecção acima de confianca_saturacao marca a célula do seu centro
+        numa grade de ocupação do frame; os templates seguintes do mesmo monstro não refinam nem
+        reportam candidatos nessas células. Roda nas threads do pool, por isso não imprime nada.
+
+        Returns:
+            Lista de (índice do template, [(x, y, confianca), ...]).
+        """
+        frame_h, frame_w = frame_gray.shape
+        ocupacao = np.zeros((-(-frame_h // CELULA_OCUPACAO), -(-frame_w // CELULA_OCUPACAO)), dtype=bool)
+        prioridades = self._prioridade[nome_monstro]
+        resultados = []
+        for i in indices:
+            h, w = self.templates_gray[nome_monstro][i].shape
+            pontos = [(x, y, confianca) for x, y, confianca in
+                      self._detectar_template(nome_monstro, i, frame_gray, frame_dev, frames_dev_small, threshold, ocupacao)
+                      if not self._celula_saturada(ocupacao, x, y, w, h)]
+            for x, y, confianca in pontos:
+                if confianca > self.confianca_saturacao:
+                    ocupacao[(y + h // 2) // CELULA_OCUPACAO, (x + w // 2) // CELULA_OCUPACAO] = True
+            prioridades[i] += ALFA_PRIORIDADE * ((1.0 if pontos else 0.0) - prioridades[i])
+            resultados.append((i, pontos))
+        return resultados
+
+    def _detectar_template(self, nome_monstro: str, i: int, frame_gray: np.ndarray,
+                           frame_dev, frames_dev_small, threshold: float,
+                           ocupacao: np.ndarray | None = None) -> list[tuple[int, int, float]]:
+        """
+        Procura um único template no frame. Roda nas threads do pool, por isso não imprime nada.
+        frames_dev_small é {escala: frame preparado} com os níveis da pirâmide usados no frame.
+
+        Returns:
+            Lista de (x, y, confianca) acima do threshold.
+        """
+        template_gray = self.templates_gray[nome_monstro][i]
+        template_small = self.templates_gray_small[nome_monstro][i]
+        escala = self.templates_escala[nome_monstro][i]
+        usa_piramide = escala is not None and escala in frames_dev_small
+        if self._backend_gpu:
+            template_busca = self.templates_gpu[nome_monstro][i]
+        elif self.metodo == "ccorr":
+            lista_busca = self.templates_norm_small if usa_piramide else self.templates_norm
+            template_busca = lista_busca[nome_monstro][i]
+        else:
+            template_busca = template_small if usa_piramide else template_gray
+
+        # Na GPU, o mapa só é baixado se algum ponto puder virar candidato
+        limiar = None
+        if self._backend_gpu:
+            limiar = self._limiar_grosseiro(threshold, escala) if usa_piramide else threshold
+
+        try:
+            res = self._match_template(frames_dev_small[escala] if usa_piramide else frame_dev, template_busca, limiar)
+            if res is None:
+                return []
+            if usa_piramide:
+                return self._refinar_candidatos(frame_gray, template_gray, template_small, escala, res, threshold, ocupacao)
+        except cv2.error:
+            # Isso pode acontecer se, por exemplo, o template for maior que o frame
+            return []
+
+        h, w = template_gray.shape
+        picos = self._extrair_picos(res, self._limiar_resposta(threshold, h, w), w, h)
+        return [(x, y, self._confianca(valor, h, w)) for x, y, valor in picos]
+
+    @staticmethod
+    def _intersecta(regiao: tuple[int, int, int, int], outra: tuple[int, int, int, int]) -> bool:
+        """Indica se dois retângulos (x, y, w, h) se sobrepõem."""
+        x, y, w, h = regiao
+        ox, oy, ow, oh = outra
+        return x < ox + ow and ox < x + w and y < oy + oh and oy < y + h
+
+    def _regioes_alteradas(self, frame_gray: np.ndarray, monstros_a_procurar: dict, chave: tuple) -> list | None:
+        """
+        Compara o frame com o da chamada anterior em blocos de BLOCO_DIFERENCA px.
+
+        Returns:
+            None se o frame inteiro deve ser processado (sem frame anterior compatível ou com
+            alteração demais). Senão, uma lista de (regiao_alterada, roi_busca), com regiao_alterada
+            em (x, y, w, h) e roi_busca em (x0, y0, x1, y1) já ampliada pelo tamanho do maior
+            template. Lista vazia quando nada mudou.
+        """
+        anterior = self._frame_gray_anterior
+        if anterior is None or anterior.shape != frame_gray.shape or chave != self._chave_anterior:
+            return None
+
+        frame_h, frame_w = frame_gray.shape
+        diferenca = cv2.absdiff(frame_gray, anterior)
+        if cv2.minMaxLoc(diferenca)[1] <= self.limiar_diferenca:
+            return []
+
+        # Máximo da diferença por bloco (o frame é completado com zeros até um múltiplo do bloco)
+        blocos_h, blocos_w = -(-frame_h // BLOCO_DIFERENCA), -(-frame_w // BLOCO_DIFERENCA)
+        diferenca = cv2.copyMakeBorder(diferenca, 0, blocos_h * BLOCO_DIFERENCA - frame_h,
+                                       0, blocos_w * BLOCO_DIFERENCA - frame_w, cv2.BORDER_CONSTANT, value=0)
+        mascara = diferenca.reshape(blocos_h, BLOCO_DIFERENCA, blocos_w, BLOCO_DIFERENCA).max(axis=(1, 3))
+        contornos, _ = cv2.findContours((mascara > self.limiar_diferenca).astype(np.uint8),
+                                        cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        # Uma detecção é afetada se o retângulo dela toca a região alterada, então a busca
+        # precisa de uma margem do tamanho do maior template em volta. A origem da ROI é alinhada
+        # ao passo da pirâmide para o recorte reduzido cair na mesma grade do frame inteiro.
+        passo = max(int(round(1.0 / self.escala_piramide)), 1)
+        max_h = max(t.shape[0] for lista in monstros_a_procurar.values() for t in lista if t is not None)
+        max_w = max(t.shape[1] for lista in monstros_a_procurar.values() for t in lista if t is not None)
+        regioes = []
+        area_busca = 0
+        for contorno in contornos:
+            bx, by, bw, bh = cv2.boundingRect(contorno)
+            x, y = bx * BLOCO_DIFERENCA, by * BLOCO_DIFERENCA
+            w, h = min(bw * BLOCO_DIFERENCA, frame_w - x), min(bh * BLOCO_DIFERENCA, frame_h - y)
+            x0, y0 = max(x - max_w + 1, 0), max(y - max_h + 1, 0)
+            x0, y0 = x0 - x0 % passo, y0 - y0 % passo
+            x1, y1 = min(x + w + max_w - 1, frame_w), min(y + h + max_h - 1, frame_h)
+            area_busca += (x1 - x0) * (y1 - y0)
+            regioes.append(((x, y, w, h), (x0, y0, x1, y1)))
+
+        if area_busca > FRACAO_MAX_ALTERADA * frame_h * frame_w:
+            return None
+        return regioes
+
+    def _cinza(self, imagem: np.ndarray, dst: np.ndarray | None = None) -> np.ndarray:
+        """Converte uma imagem BGR (ou BGRA) para o "cinza" da detecção: luminância ou canal verde."""
+        if self.usar_canal_verde:
+            return cv2.extractChannel(imagem, 1, dst=dst)
+        return cv2.cvtColor(imagem, cv2.COLOR_BGR2GRAY, dst=dst)
+
+    def _converter_cinza(self, frame: np.ndarray) -> np.ndarray:
+        """
+        Converte o frame BGR (ou BGRA) para cinza no buffer da vez (ver self._buffers_cinza).
+        Um frame que já está em cinza só é copiado para o buffer: o chamador pode reaproveitar
+        o array dele, e a detecção incremental precisa do frame anterior intacto.
+        """
+        self._indice_cinza ^= 1
+        buffer = self._buffers_cinza[self._indice_cinza]
+        if buffer is None or buffer.shape != frame.shape[:2]:
+            buffer = self._buffers_cinza[self._indice_cinza] = np.empty(frame.shape[:2], dtype=np.uint8)
+        if frame.ndim == 2:
+            np.copyto(buffer, frame)
+            return buffer
+        return self._cinza(frame, dst=buffer)
+
+    def _piramide_frame(self, frame_gray: np.ndarray, escalas: set[float]) -> dict[float, np.ndarray]:
+        """
+        Reduz o frame em cinza para cada escala pedida. Na pirâmide gaussiana cada nível sai do
+        anterior (um pyrDown por nível), até o mais reduzido pedido. O frame inteiro usa buffers
+        reaproveitados entre chamadas; recortes (detecção incremental) têm tamanhos variados e
+        são alocados a cada vez.
+
+        Returns:
+            {escala: frame reduzido}
+        """
+        frame_inteiro = frame_gray is self._buffers_cinza[self._indice_cinza]
+        menor = min(escalas, default=1.0)
+        niveis = {}
+        imagem, escala_anterior = frame_gray, 1.0
+        for escala in self._escalas_piramide():
+            if escala < menor:
+                break
+            if escala * 2 == escala_anterior:
+                buffer = None
+                if frame_inteiro:
+                    forma = ((imagem.shape[0] + 1) // 2, (imagem.shape[1] + 1) // 2)
+                    buffer = self._buffers_piramide.get(escala)
+                    if buffer is None or buffer.shape != forma:
+                        buffer = self._buffers_piramide[escala] = np.empty(forma, dtype=np.uint8)
+                imagem = cv2.pyrDown(imagem, dst=buffer)
+            else:
+                imagem = self._reduzir(frame_gray, escala)
+            escala_anterior = escala
+            if escala in escalas:
+                niveis[escala] = imagem
+        return niveis
+
+    def _detectar_em_cinza(self, frame_gray: np.ndarray, monstros_a_procurar: dict, threshold: float,
+                           deslocamento: tuple[int, int] = (0, 0)) -> list:
+        """
+        Procura os monstros num frame (ou recorte de frame) já em escala de cinza.
+
+        Args:
+            deslocamento: (dx, dy) somado às posições encontradas, para recortes do frame.
+
+        Returns:
+            Lista de detecções no formato de detectar_monstros (sem ordenação).
+        """
+        dx, dy = deslocamento
+        detections = []
+
+        # Monta a lista de tarefas (nome, [índices]): uma por monstro, com os templates ordenados
+        # pela taxa de acerto recente e, no empate, pela área (maiores primeiro)
+        tarefas = []
+        for nome_monstro, lista_templates_gray in monstros_a_procurar.items():
+            indices = []
+            for i, template_gray in enumerate(lista_templates_gray):
+                if template_gray is None or template_gray.size == 0:
+                    logger.warning("AVISO: Template para %s (índice %d) está vazio ou inválido.", nome_monstro, i)
+                    continue
+
+                # Verificar se o frame tem dimensões suficientes para o template
+                if frame_gray.shape[0] < template_gray.shape[0] or frame_gray.shape[1] < template_gray.shape[1]:
+                    continue
+                indices.append(i)
+            if indices:
+                prioridades = self._prioridade[nome_monstro]
+                indices.sort(key=lambda i: (-prioridades[i], -lista_templates_gray[i].size))
+                tarefas.append((nome_monstro, indices))
+
+        # No pool, os monstros com mais trabalho (soma das áreas dos templates) entram primeiro,
+        # para que nenhuma tarefa longa comece por último e atrase o fim do frame
+        if self._pool:
+            tarefas.sort(key=lambda tarefa: -sum(monstros_a_procurar[tarefa[0]][i].size for i in tarefa[1]))
+
+        # Cada nível da pirâmide (e o frame em resolução total, só se algum template não usar a
+        # pirâmide) é preparado uma vez (enviado à GPU ou com as integrais calculadas) e
+        # reutilizado por todos os templates daquele nível
+        escalas = {self.templates_escala[nome][i] for nome, indices in tarefas for i in indices}
+        frames_dev_small = {escala: self._preparar_frame(nivel)
+                            for escala, nivel in self._piramide_frame(frame_gray, escalas - {None}).items()}
+        frame_dev = self._preparar_frame(frame_gray) if None in escalas else None
+
+        def processar(tarefa):
+            return self._detectar_monstro(tarefa[0], tarefa[1], frame_gray, frame_dev, frames_dev_small, threshold)
+
+        resultados = self._pool.map(processar, tarefas) if self._pool else map(processar, tarefas)
+
+        # Os picos já saem suprimidos por template (e pela grade de ocupação entre templates do
+        # mesmo monstro), então só os sobreviventes viram dicionários; as consultas por monstro e
+        # por template ficam fora do laço dos picos
+        for (nome_monstro, _), resultados_monstro in zip(tarefas, resultados):
+            lista_templates_gray = self.templates_gray[nome_monstro]
+            nomes_arquivos = self.template_filenames[nome_monstro]
+            for i, pontos in resultados_monstro:
+                if not pontos:
+                    continue
+                h, w = lista_templates_gray[i].shape # Altura e largura do template
+                sprite_usado = nomes_arquivos[i]
+                detections.extend({
+                    "nome": nome_monstro,
+                    "regiao": (x + dx, y + dy, w, h), # (x, y, largura, altura)
+                    "confianca": confianca,
+                    "sprite_usado": sprite_usado
+                } for x, y, confianca in pontos)
+        
+        return detections
+
+    def detectar_monstros(self, frame: np.ndarray, threshold: float = 0.8, monstros_alvo: list[str] | None = None,
+                          max_deteccoes: int | None = None) -> list:
         """
         Detecta monstros em um frame de imagem usando os templates carregados.
 
         Args:
-            frame: O frame da tela (imagem NumPy BGR) onde procurar os monstros.
+            frame: O frame da tela (imagem NumPy BGR/BGRA, ou já em escala de cinza) onde procurar
+                   os monstros. Passar o frame em cinza evita a conversão no detector.
             threshold: O limiar de confiança para considerar uma detecção válida (0.0 a 1.0).
             monstros_alvo: Uma lista opcional de nomes de monstros para focar a detecção.
                              Se None, procura todos os monstros com templates carregados.
+            max_deteccoes: Se dado, retorna só as max_deteccoes detecções de maior confiança
+                           (seleção parcial com np.argpartition, sem ordenar todas).
 
         Returns:
             Uma lista de dicionários, onde cada dicionário representa um monstro detectado.
+            Cada pico de correlação é reportado uma única vez (as posições vizinhas, do tamanho
+            do template, são suprimidas).
             Ex: [{"nome": "Poring", "regiao": (x, y, w, h), "confianca": 0.92, "sprite_usado": "Poring_Sprit_1.png"}, ...]
         """
         detections = []
         
         if not self.templates:
-            print("Nenhum template carregado. Não é possível detectar monstros.")
+            logger.warning("Nenhum template carregado. Não é possível detectar monstros.")
             return detections
 
-        # Converte o frame para escala de cinza para a detecção, se os templates também forem em escala de cinza.
-        # Se os templates forem coloridos, a conversão pode ser desnecessária ou até prejudicial.
-        # Por agora, vamos assumir que os templates e o frame podem ser processados como estão (BGR).
-        # frame_gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) # Descomente se for usar templates em escala de cinza
-
         monstros_a_procurar = {}
         if monstros_alvo:
             for nome_monstro in monstros_alvo:
-                if nome_monstro in self.templates:
-                    monstros_a_procurar[nome_monstro] = self.templates[nome_monstro]
+                if nome_monstro in self.templates_gray:
+                    monstros_a_procurar[nome_monstro] = self.templates_gray[nome_monstro]
                 else:
-                    print(f"AVISO: Monstro alvo '{nome_monstro}' não encontrado nos templates carregados.")
+                    logger.warning("AVISO: Monstro alvo '%s' não encontrado nos templates carregados.", nome_monstro)
         else:
             # Se nenhum monstro alvo específico for fornecido, procura todos os monstros carregados
-            monstros_a_procurar = self.templates
+            monstros_a_procurar = self.templates_gray
 
         if not monstros_a_procurar:
-            print("Nenhum monstro selecionado ou válido para detecção.")
+            logger.warning("Nenhum monstro selecionado ou válido para detecção.")
             return detections
 
-        for nome_monstro, lista_templates_img in monstros_a_procurar.items():
-            for i, template_img in enumerate(lista_templates_img):
-                # template_gray = cv2.cvtColor(template_img, cv2.COLOR_BGR2GRAY) # Se for usar escala de cinza
-                # w, h = template_gray.shape[::-1] # Largura e altura do template em escala de cinza
-                
-                if template_img is None or template_img.size == 0:
-                    print(f"AVISO: Template para {nome_monstro} (índice {i}) está vazio ou inválido.")
-                    continue
+        # Converte o frame para escala de cinza uma única vez (os templates já estão em cinza)
+        frame_gray = self._converter_cinza(frame)
 
-                # Verificar se o frame tem dimensões suficientes para o template
-                if frame.shape[0] < template_img.shape[0] or frame.shape[1] < template_img.shape[1]:
-                    # print(f"AVISO: Frame ({frame.shape}) é menor que o template {self.template_filenames[nome_monstro][i]} ({template_img.shape}). Pulando.")
-                    continue
+        chave = (threshold, tuple(monstros_a_procurar))
+        regioes = self._regioes_alteradas(frame_gray, monstros_a_procurar, chave) if self.detectar_incremental else None
+        if regioes is None:
+            detections = self._detectar_em_cinza(frame_gray, monstros_a_procurar, threshold)
+        else:
+            # Mantém as detecções anteriores que não tocam nenhuma região alterada e procura de novo
+            # só nas regiões alteradas (ampliadas pelo tamanho do maior template)
+            detections = [dict(d) for d in self._deteccoes_anteriores
+                          if not any(self._intersecta(d["regiao"], r) for r, _ in regioes)]
+            vistas = set()
+            for regiao, (x0, y0, x1, y1) in regioes:
+                for d in self._detectar_em_cinza(frame_gray[y0:y1, x0:x1], monstros_a_procurar, threshold, (x0, y0)):
+                    identificador = (d["nome"], d["sprite_usado"], d["regiao"])
+                    if self._intersecta(d["regiao"], regiao) and identificador not in vistas:
+                        vistas.add(identificador)
+                        detections.append(d)
 
-                w, h = template_img.shape[1], template_img.shape[0] # Largura e altura do template colorido
-
-                # Método de matching: cv2.TM_CCOEFF_NORMED é geralmente bom.
-                # Outros métodos: TM_SQDIFF_NORMED (menor valor é melhor), TM_CCORR_NORMED.
-                try:
-                    res = cv2.matchTemplate(frame, template_img, cv2.TM_CCOEFF_NORMED)
-                except cv2.error as e:
-                    # Isso pode acontecer se, por exemplo, o template for maior que o frame
-                    # print(f"Erro no cv2.matchTemplate para {self.template_filenames[nome_monstro][i]}: {e}")
-                    continue
-
-                # Encontra locais com score acima do threshold
-                loc = np.where(res >= threshold)
-                
-                # O resultado de np.where é uma tupla de arrays (um para y, um para x)
-                # Iteramos sobre os pontos encontrados
-                for pt in zip(*loc[::-1]): # pt é (x, y)
-                    confianca = res[pt[1], pt[0]] # Acessa o valor de confiança em res[y, x]
-                    detections.append({
-                        "nome": nome_monstro,
-                        "regiao": (pt[0], pt[1], w, h), # (x, y, largura, altura)
-                        "confianca": float(confianca),
-                        "sprite_usado": self.template_filenames[nome_monstro][i]
-                    })
-        
-        # Opcional: aplicar Non-Maximum Suppression (NMS) para remover detecções sobrepostas.
-        # Por enquanto, vamos retornar todas as detecções acima do threshold.
-        # Se houver muitas detecções redundantes, NMS pode ser adicionado aqui.
+        self._frame_gray_anterior = frame_gray
+        self._chave_anterior = chave
+        self._deteccoes_anteriores = [dict(d) for d in detections]
 
         if detections:
-            # Ordenar por confiança (opcional, mas pode ser útil)
-            detections.sort(key=lambda d: d["confianca"], reverse=True)
+            # Ordenar por confiança (opcional, mas pode ser útil). argsort estável em C sobre as
+            # confianças em vez de comparar dicionários em Python; empates mantêm a ordem original
+            confiancas = np.fromiter((d["confianca"] for d in detections), dtype=np.float64, count=len(detections))
+            if max_deteccoes is not None and max_deteccoes < len(detections):
+                # Só as K melhores: seleção O(N) e ordenação apenas delas. A detecção incremental
+                # continua com a lista completa (guardada acima)
+                melhores = np.argpartition(-confiancas, max(max_deteccoes - 1, 0))[:max_deteccoes]
+                melhores.sort()
+                ordem = melhores[np.argsort(-confiancas[melhores], kind="stable")]
+            else:
+                ordem = np.argsort(-confiancas, kind="stable")
+            detections = [detections[k] for k in ordem]
             # print(f"Detectados {len(detections)} monstros.")
         # else:
             # print("Nenhum monstro detectado no frame com o threshold especificado.")
@@ -202,7 +1163,66 @@ class MonsterDetector:
 
 
 # --- Exemplo de Uso (para teste do carregamento e DETECÇÃO EM TEMPO REAL) ---
+class CacheRotulos:
+    """
+    Rótulos "Nome (confiança)" renderizados uma única vez e copiados para o frame nas chamadas
+    seguintes, em vez de rasterizar o texto com cv2.putText a cada detecção e frame. A confiança
+    é arredondada para passos de passo_confianca, o que limita o número de rótulos distintos.
+    """
+
+    def __init__(self, cor: tuple[int, int, int] = (0, 255, 0), escala_fonte: float = 0.5,
+                 passo_confianca: float = 0.05):
+        _importar_dependencias() # Pode ser usada sem nenhum MonsterDetector criado antes
+        self.cor = cor
+        self.escala_fonte = escala_fonte
+        self.passo_confianca = passo_confianca
+        self._rotulos = {} # {(nome, confiança arredondada): (imagem BGR, máscara, altura acima da base)}
+
+    def _rotulo(self, nome: str, confianca: float) -> tuple[np.ndarray, np.ndarray, int]:
+        chave = (nome, round(round(confianca / self.passo_confianca) * self.passo_confianca, 2))
+        rotulo = self._rotulos.get(chave)
+        if rotulo is None:
+            texto = f"{chave[0]} ({chave[1]:.2f})"
+            (largura, altura), base = cv2.getTextSize(texto, cv2.FONT_HERSHEY_SIMPLEX, self.escala_fonte, 1)
+            imagem = np.zeros((altura + base, largura, 3), dtype=np.uint8)
+            cv2.putText(imagem, texto, (0, altura), cv2.FONT_HERSHEY_SIMPLEX, self.escala_fonte, self.cor, 1)
+            rotulo = self._rotulos[chave] = (imagem, imagem.any(axis=2).view(np.uint8), altura)
+        return rotulo
+
+    def desenhar(self, frame: np.ndarray, nome: str, confianca: float, x: int, y: int):
+        """Desenha o rótulo com a linha de base em (x, y), como o cv2.putText, cortando nas bordas do frame."""
+        if frame.ndim != 3 or frame.shape[2] != 3: # Rótulos pré-renderizados são BGR
+            cv2.putText(frame, f"{nome} ({confianca:.2f})", (x, y), cv2.FONT_HERSHEY_SIMPLEX, self.escala_fonte, self.cor, 1)
+            return
+        imagem, mascara, altura = self._rotulo(nome, confianca)
+        y0 = y - altura
+        fy0, fx0 = max(y0, 0), max(x, 0)
+        fy1, fx1 = min(y0 + imagem.shape[0], frame.shape[0]), min(x + imagem.shape[1], frame.shape[1])
+        if fy1 <= fy0 or fx1 <= fx0:
+            return
+        recorte = (slice(fy0 - y0, fy1 - y0), slice(fx0 - x, fx1 - x))
+        cv2.copyTo(imagem[recorte], mascara[recorte], frame[fy0:fy1, fx0:fx1])
+
+
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    _importar_dependencias()
+
+    # Tentativa de importação dos módulos de screen_capture
+    try:
+        from screen_capture import MSSCapturer, ThreadedCapturer, select_and_configure_capture_region
+        SCREEN_CAPTURE_AVAILABLE = True
+    except ImportError:
+        print("AVISO: Módulo 'screen_capture' não encontrado. O teste de integração com captura de tela será desabilitado.")
+        SCREEN_CAPTURE_AVAILABLE = False
+        # Definir classes e funções dummy para evitar erros no if __name__ se o import falhar
+        class MSSCapturer:
+            def __init__(self, target_fps=30): pass
+            def start(self): pass
+            def stop(self): pass
+        ThreadedCapturer = None
+        def select_and_configure_capture_region(capturer): return None, None
+
     print("Iniciando teste do MonsterDetector...")
     
     # Configuração e carregamento de templates (como antes)
@@ -252,43 +1272,51 @@ if __name__ == "__main__":
 
     if SCREEN_CAPTURE_AVAILABLE:
         print("\n--- INICIANDO TESTE DE INTEGRAÇÃO COM SCREEN_CAPTURE ---")
-        target_window_title, monitor_info, capturer_instance = select_and_configure_capture_region(try_dxcam=False)
+        target_fps = 15 # FPS desejado para o loop de captura e detecção
+        delay_per_frame = 1.0 / target_fps
+
+        # Iniciado pelo ThreadedCapturer na thread de captura (os handles do mss são por thread);
+        # a seleção da janela só define a região
+        capturer_instance = MSSCapturer(target_fps=target_fps)
+        monitor_info, target_window_title = select_and_configure_capture_region(capturer_instance)
 
-        if capturer_instance:
+        if monitor_info:
             print(f"Captura configurada para a janela: '{target_window_title}'")
             print("Pressione 'q' na janela de visualização para sair.")
-            
-            target_fps = 15 # FPS desejado para o loop de captura e detecção
-            delay_per_frame = 1.0 / target_fps
-            
+
+            # A captura roda em outra thread (triple buffer do screen_capture), sobrepondo-se à
+            # detecção e à exibição; o frame devolvido é nosso até a próxima chamada
+            captura = ThreadedCapturer(capturer_instance)
+            captura.start()
+            rotulos = CacheRotulos()
+
             try:
                 while True:
                     start_time = time.time()
                     
-                    frame = capturer_instance.get_frame()
+                    frame = captura.capture_frame()
                     if frame is None:
                         print("Não foi possível capturar o frame. A janela foi fechada ou minimizada?")
                         # Tenta re-selecionar a janela ou aguarda um pouco.
                         # Para simplificar, vamos sair do loop por agora.
                         # Poderia adicionar uma lógica para tentar re-selecionar a janela aqui.
-                        # capturer_instance.close()
-                        # target_window_title, monitor_info, capturer_instance = select_and_configure_capture_region(try_dxcam=False)
-                        # if not capturer_instance:
+                        # captura.stop()
+                        # monitor_info, target_window_title = select_and_configure_capture_region(capturer_instance)
+                        # if not monitor_info:
                         #     print("Não foi possível reconfigurar a captura. Encerrando.")
                         #     break
                         # continue
                         break 
 
-                    # Redimensionar o frame para a detecção se ele for muito grande (opcional, pode ajudar na performance)
-                    # frame_para_detectar = cv2.resize(frame, (frame.shape[1] // 2, frame.shape[0] // 2))
-                    frame_para_detectar = frame.copy() # Usar uma cópia para não desenhar no original antes da detecção
-
-                    # Detectar todos os monstros (ou especificar monstros_alvo=['Poring', 'Zombie'] por exemplo)
-                    detections = detector.detectar_monstros(frame_para_detectar, threshold=0.7) # Ajuste o threshold conforme necessário
+                    # Detectar todos os monstros (ou especificar monstros_alvo=['Poring', 'Zombie'] por exemplo).
+                    # O buffer devolvido pela captura é nosso até o próximo frame, então não é preciso copiá-lo.
+                    detections = detector.detectar_monstros(frame, threshold=0.7) # Ajuste o threshold conforme necessário
 
                     # Desenhar retângulos nas detecções no frame original (para exibição)
-                    if detections:
-                        print(f"Detectado(s) {len(detections)} monstro(s) no frame atual:")
+                    # O log por detecção só é formatado quando DEBUG está habilitado
+                    log_deteccoes = logger.isEnabledFor(logging.DEBUG)
+                    if detections and log_deteccoes:
+                        logger.debug("Detectado(s) %d monstro(s) no frame atual:", len(detections))
                     for d in detections:
                         nome = d['nome']
                         x, y, w, h = d['regiao']
@@ -300,32 +1328,31 @@ if __name__ == "__main__":
                         pt2 = (x + w, y + h)
                         cv2.rectangle(frame, pt1, pt2, (0, 255, 0), 2)
                         
-                        # Texto para a detecção
-                        label = f"{nome} ({conf:.2f})"
-                        cv2.putText(frame, label, (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
-                        print(f"  - {nome} (sprite: {sprite_usado}) @ ({x},{y},{w},{h}) com conf={conf:.2f}")
+                        # Texto para a detecção (rótulo pré-renderizado, reaproveitado entre frames)
+                        rotulos.desenhar(frame, nome, conf, x, y - 10)
+                        if log_deteccoes:
+                            logger.debug("  - %s (sprite: %s) @ (%d,%d,%d,%d) com conf=%.2f", nome, sprite_usado, x, y, w, h, conf)
 
                     cv2.imshow(f"Detecção em Tempo Real - {target_window_title}", frame)
 
-                    # Calcular tempo para manter o FPS
-                    elapsed_time = time.time() - start_time
-                    sleep_time = delay_per_frame - elapsed_time
-                    if sleep_time > 0:
-                        time.sleep(sleep_time)
-                    
+                    # Espera o resto do tempo do frame no próprio waitKey, que também processa os
+                    # eventos da janela (no mínimo 1 ms, senão o waitKey bloqueia indefinidamente)
+                    ms_restantes = max(1, int((delay_per_frame - (time.time() - start_time)) * 1000))
+                    tecla = cv2.waitKey(ms_restantes) & 0xFF
+
                     # Atual FPS (informativo)
                     actual_fps = 1.0 / (time.time() - start_time)
                     # print(f"FPS Atual: {actual_fps:.2f}") # Descomente para ver FPS no console
 
-                    if cv2.waitKey(1) & 0xFF == ord('q'):
+                    if tecla == ord('q'):
                         print("Tecla 'q' pressionada. Encerrando a visualização.")
                         break
             
             except KeyboardInterrupt:
                 print("Interrupção pelo usuário. Encerrando.")
             finally:
-                if capturer_instance:
-                    capturer_instance.close()
+                captura.stop() # Para também o capturer_instance
+                detector.fechar()
                 cv2.destroyAllWindows()
                 print("Recursos de captura e janelas liberados.")
         else:
@@ -1,30 +1,168 @@
 import abc
+import ctypes
+import ctypes.wintypes
+import functools
+import logging
+import multiprocessing
+import os
+import threading
 import time
+import weakref
+from multiprocessing import shared_memory
 import mss
 import numpy as np
+import cv2
 import dxcam # type: ignore # DXcam pode não ter stubs de tipo perfeitos
 import pygetwindow # Adicionado para calibração de janela
+try:
+    from windows_capture import WindowsCapture # type: ignore # Backend WGC opcional (pip install windows-capture)
+except ImportError:
+    WindowsCapture = None
+
+logger = logging.getLogger(__name__)
+
+# Última vez (time.monotonic) em que cada erro do caminho de captura foi registrado. Um erro
+# que se repete a cada frame (ex.: dispositivo do DXcam indisponível por alguns segundos) sai
+# no máximo uma vez por intervalo, em vez de uma escrita no terminal por frame.
+_ultimo_log: dict[str, float] = {}
+
+def _throttle(chave: str, segundos: float = 1.0) -> bool:
+    """Indica se o erro identificado por chave pode ser registrado agora (no máximo um por intervalo)."""
+    agora = time.monotonic()
+    ultimo = _ultimo_log.get(chave)
+    if ultimo is not None and agora - ultimo < segundos:
+        return False
+    _ultimo_log[chave] = agora
+    return True
+
+# Abaixo disso o restante da espera é feito em busy-wait: o time.sleep do Windows pode
+# acordar até ~15 ms depois do pedido (granularidade do timer do sistema). Cada sleep para
+# MARGEM_BUSY_WAIT_NS / 2 antes do prazo, então o busy-wait final dura de 1 a 2 ms
+MARGEM_BUSY_WAIT_NS = 2_000_000
+
+def sleep_until(deadline_ns: int):
+    """
+    Dorme até o instante deadline_ns de time.monotonic_ns(), terminando os últimos 1-2 ms
+    (entre MARGEM_BUSY_WAIT_NS / 2 e MARGEM_BUSY_WAIT_NS) em busy-wait com time.sleep(0), que
+    cede o GIL e a CPU a outras threads prontas sem esperar pelo timer do sistema.
+    """
+    while True:
+        restante = deadline_ns - time.monotonic_ns()
+        if restante <= 0:
+            return
+        if restante > MARGEM_BUSY_WAIT_NS:
+            time.sleep((restante - MARGEM_BUSY_WAIT_NS // 2) / 1e9)
+        else:
+            time.sleep(0)
+
+# --- Estado da janela alvo via user32 (só Windows) ---
+# Consultas diretas pelo HWND guardado na seleção: chamadas O(1), em vez de enumerar todas as
+# janelas (EnumWindows) e comparar títulos como o pygetwindow.getWindowsWithTitle.
+_user32 = None
+if os.name == "nt":
+    _user32 = ctypes.windll.user32
+    for _nome in ("IsWindow", "IsWindowVisible", "IsIconic"):
+        getattr(_user32, _nome).argtypes = [ctypes.wintypes.HWND]
+        getattr(_user32, _nome).restype = ctypes.wintypes.BOOL
+    _user32.GetWindowRect.argtypes = [ctypes.wintypes.HWND, ctypes.POINTER(ctypes.wintypes.RECT)]
+    _user32.GetWindowRect.restype = ctypes.wintypes.BOOL
+    _user32.GetWindowTextW.argtypes = [ctypes.wintypes.HWND, ctypes.wintypes.LPWSTR, ctypes.c_int]
+    _user32.GetWindowTextW.restype = ctypes.c_int
+    _WNDENUMPROC = ctypes.WINFUNCTYPE(ctypes.wintypes.BOOL, ctypes.wintypes.HWND, ctypes.wintypes.LPARAM)
+    _user32.EnumWindows.argtypes = [_WNDENUMPROC, ctypes.wintypes.LPARAM]
+    _user32.EnumWindows.restype = ctypes.wintypes.BOOL
+    _dwmapi = ctypes.windll.dwmapi
+    _dwmapi.DwmGetWindowAttribute.argtypes = [ctypes.wintypes.HWND, ctypes.wintypes.DWORD, ctypes.c_void_p,
+                                              ctypes.wintypes.DWORD]
+    _dwmapi.DwmGetWindowAttribute.restype = ctypes.c_long
+    _DWMWA_EXTENDED_FRAME_BOUNDS = 9
+
+def is_window_capturable(hwnd: int) -> bool:
+    """Indica se a janela ainda existe, está visível e não está minimizada."""
+    return bool(_user32.IsWindow(hwnd) and _user32.IsWindowVisible(hwnd) and not _user32.IsIconic(hwnd))
+
+def get_window_rect(hwnd: int) -> tuple[int, int, int, int] | None:
+    """Retorna (x, y, largura, altura) da janela, ou None se a consulta falhar."""
+    rect = ctypes.wintypes.RECT()
+    if not _user32.GetWindowRect(hwnd, ctypes.byref(rect)):
+        return None
+    return rect.left, rect.top, rect.right - rect.left, rect.bottom - rect.top
+
+def get_window_title(hwnd: int) -> str:
+    """Retorna o título da janela ("" se não tiver ou a consulta falhar)."""
+    titulo = ctypes.create_unicode_buffer(512)
+    _user32.GetWindowTextW(hwnd, titulo, len(titulo))
+    return titulo.value
+
+def get_window_frame_rect(hwnd: int) -> tuple[int, int, int, int] | None:
+    """
+    Retorna (x, y, largura, altura) da moldura visível da janela, a área que o DWM compõe (e
+    que o Windows.Graphics.Capture captura). No Windows 10/11 o GetWindowRect inclui as bordas
+    invisíveis de redimensionamento; usa-o só se o DWM não responder.
+    """
+    rect = ctypes.wintypes.RECT()
+    if _dwmapi.DwmGetWindowAttribute(hwnd, _DWMWA_EXTENDED_FRAME_BOUNDS, ctypes.byref(rect),
+                                     ctypes.sizeof(rect)) != 0:
+        return get_window_rect(hwnd)
+    return rect.left, rect.top, rect.right - rect.left, rect.bottom - rect.top
+
+def list_windows() -> list[tuple[int, str, tuple[int, int, int, int]]]:
+    """
+    Lista as janelas visíveis, com título e tamanho válido, como (hwnd, título, (x, y, largura,
+    altura)). No Windows é uma única passada do EnumWindows que já lê título e retângulo de cada
+    janela; sem o user32, usa o pygetwindow.
+    """
+    if _user32 is None:
+        return [(w._hWnd, w.title, (w.left, w.top, w.width, w.height))
+                for w in pygetwindow.getAllWindows() if w.title and w.width > 0 and w.height > 0]
+
+    janelas = []
+    titulo = ctypes.create_unicode_buffer(512)
+    rect = ctypes.wintypes.RECT()
+
+    def callback(hwnd, _lparam):
+        if _user32.IsWindowVisible(hwnd) and _user32.GetWindowTextW(hwnd, titulo, len(titulo)) \
+                and _user32.GetWindowRect(hwnd, ctypes.byref(rect)):
+            largura, altura = rect.right - rect.left, rect.bottom - rect.top
+            if largura > 0 and altura > 0:
+                janelas.append((hwnd, titulo.value, (rect.left, rect.top, largura, altura)))
+        return True
+
+    _user32.EnumWindows(_WNDENUMPROC(callback), 0)
+    return janelas
 
 class ScreenCapturerBase(abc.ABC):
     """
     Classe base abstrata para capturadores de tela.
     Define a interface comum para diferentes métodos de captura.
+
+    Os capturadores podem ser serializados com pickle (ex.: enviados a um processo de captura,
+    ver ProcessCapturer): os atributos em _non_picklable (handles nativos) não são copiados e
+    o capturador chega parado; start() no processo de destino os recria.
     """
+    _non_picklable: tuple[str, ...] = ()
+
     def __init__(self, target_fps: int = 30):
         self.target_fps = target_fps
         self.frame_time = 1.0 / target_fps if target_fps > 0 else 0
         self._running = False
+        # Pronto para capturar: rodando e com o handle nativo criado. Uma única flag para o
+        # teste no início de capture_frame, em vez de is_running() mais a checagem do handle
+        self._ready = False
         self.region = {"top": 0, "left": 0, "width": 0, "height": 0} # Formato MSS
+        self.hwnd: int | None = None # HWND da janela alvo, guardado por select_and_configure_capture_region
 
     @abc.abstractmethod
     def start(self):
         """Inicia o capturador (se necessário)."""
         self._running = True
+        self._ready = True
 
     @abc.abstractmethod
     def stop(self):
         """Para o capturador (se necessário)."""
         self._running = False
+        self._ready = False
 
     @abc.abstractmethod
     def set_region(self, x: int, y: int, width: int, height: int):
@@ -40,6 +178,67 @@ class ScreenCapturerBase(abc.ABC):
         """
         pass
 
+    def capture_frame_tensor(self, out: np.ndarray, region: tuple[int, int, int, int] | None = None,
+                             rgb: bool = True) -> np.ndarray | None:
+        """
+        Captura um frame e o escreve direto em out, no layout NCHW usado por modelos de ML:
+        (3, h, w) ou (1, 3, h, w). Com out float (float16/float32) os valores são normalizados
+        para 0-1 na mesma passada que separa e reordena os canais, sem o astype(np.float32) / 255
+        e o transpose intermediários; com out uint8 os canais só são reorganizados.
+
+        Args:
+            out: Tensor de saída pré-alocado, reaproveitado entre chamadas.
+            region: Região opcional (x, y, largura, altura), como em capture_frame.
+            rgb: Se True, os canais saem na ordem RGB; senão, BGR.
+
+        Returns:
+            out, ou None se a captura falhar ou o frame não tiver o tamanho de out.
+        """
+        frame = self.capture_frame(region)
+        if frame is None:
+            return None
+        dst = out[0] if out.ndim == 4 else out
+        if dst.shape != (3, frame.shape[0], frame.shape[1]):
+            if _throttle("tensor"):
+                logger.warning("Erro: Tensor de saída %s incompatível com o frame %s.", out.shape, frame.shape)
+            return None
+        # View (3, h, w) sobre o frame BGR/BGRA, sem cópia (descarta o alfa e inverte os canais
+        # pelos strides); a única passada sobre a memória é a escrita em dst
+        canais = (frame[:, :, 2::-1] if rgb else frame[:, :, :3]).transpose(2, 0, 1)
+        if np.issubdtype(dst.dtype, np.floating):
+            np.multiply(canais, np.float32(1.0 / 255.0), out=dst, casting="unsafe")
+        else:
+            np.copyto(dst, canais, casting="unsafe")
+        return out
+
+    def capture_frames_multi(self, regions: list[tuple[int, int, int, int]]) -> list[np.ndarray] | None:
+        """
+        Captura várias regiões (x, y, largura, altura) de uma vez: um único grab do retângulo que
+        envolve todas e, para cada região, uma view (sem cópia) desse frame. Troca K capturas
+        por uma, ao custo de copiar também a área entre as regiões.
+
+        As views compartilham o buffer de capture_frame, então valem o mesmo tempo que ele.
+        Retorna None se a captura falhar.
+        """
+        if not regions:
+            return []
+        x0 = min(x for x, _, _, _ in regions)
+        y0 = min(y for _, y, _, _ in regions)
+        x1 = max(x + w for x, _, w, _ in regions)
+        y1 = max(y + h for _, y, _, h in regions)
+        frame = self.capture_frame((x0, y0, x1 - x0, y1 - y0))
+        if frame is None:
+            return None
+        return [frame[y - y0:y - y0 + h, x - x0:x - x0 + w] for x, y, w, h in regions]
+
+    def __getstate__(self):
+        estado = self.__dict__.copy()
+        for nome in self._non_picklable:
+            estado[nome] = None
+        estado["_running"] = False
+        estado["_ready"] = False
+        return estado
+
     def get_actual_fps(self) -> float:
         """Retorna o FPS real (pode ser implementado por subclasses)."""
         return 0.0
@@ -48,21 +247,47 @@ class ScreenCapturerBase(abc.ABC):
         return self._running
 
 class MSSCapturer(ScreenCapturerBase):
-    """Capturador de tela usando a biblioteca MSS."""
-    def __init__(self, target_fps: int = 30):
+    """
+    Capturador de tela usando a biblioteca MSS.
+
+    Args:
+        target_fps: FPS desejado para a captura.
+        return_bgra: Se True, capture_frame retorna o frame BGRA do MSS sem nenhuma cópia (uma
+                     view sobre o buffer do grab). Se False (padrão), converte para BGR contíguo
+                     com cv2.cvtColor em dois buffers pré-alocados que se alternam (A/B): o frame
+                     retornado continua válido durante a captura seguinte e só é sobrescrito na
+                     outra depois dela.
+                     O cv2 (matchTemplate, cvtColor para cinza, desenho) aceita BGRA diretamente.
+    """
+    _non_picklable = ("sct", "_grab")
+
+    def __init__(self, target_fps: int = 30, return_bgra: bool = False):
         super().__init__(target_fps)
         self.sct = None
+        self._grab = None # sct.grab com a região padrão já embutida (ver _preparar_grab)
+        self.return_bgra = return_bgra
+        # Saídas BGR alternadas entre capturas; _ready_idx é a do último frame retornado
+        self._frame_bufs: list[np.ndarray | None] = [None, None]
+        self._ready_idx = 0
+
+    def __getstate__(self):
+        estado = super().__getstate__()
+        estado["_frame_bufs"] = [None, None] # Realocados na primeira captura, sem copiar os frames
+        return estado
 
     def start(self):
         try:
             self.sct = mss.mss()
             super().start()
+            self._ready = self.sct is not None
+            self._preparar_grab()
             print("MSS Capturer iniciado.")
         except Exception as e:
             print(f"Erro ao iniciar MSS Capturer: {e}")
-            self._running = False
+            self._running = self._ready = False
 
     def stop(self):
+        self._grab = None
         if self.sct:
             self.sct.close()
             self.sct = None
@@ -74,64 +299,114 @@ class MSSCapturer(ScreenCapturerBase):
             print(f"Erro: Região de captura inválida para MSS: w={width}, h={height}")
             return
         super().set_region(x, y, width, height)
+        if not self.return_bgra:
+            self._frame_bufs = [np.empty((height, width, 3), dtype=np.uint8) for _ in range(2)]
+        self._preparar_grab()
         # print(f"MSS region set to: {self.region}")
 
+    def _preparar_grab(self):
+        """
+        Embute a região padrão (já validada) no grab, para capture_frame sem argumento não
+        refazer a montagem e a validação da região a cada frame.
+        """
+        if self.sct and self.region["width"] > 0 and self.region["height"] > 0:
+            self._grab = functools.partial(self.sct.grab, dict(self.region))
+        else:
+            self._grab = None
 
     def capture_frame(self, region: tuple[int, int, int, int] | None = None) -> np.ndarray | None:
-        if not self.is_running() or not self.sct:
+        if not self._ready:
             # print("MSS Capturer não está rodando ou não inicializado.")
             return None
 
-        capture_region = self.region
+        # Sem region, usa o grab com a região padrão já validada e embutida
+        grab = self._grab
         if region:
             if region[2] <=0 or region[3] <=0: # width or height
                 # print(f"Região de captura inválida fornecida para MSS: {region}")
                 return None
-            capture_region = {"top": region[1], "left": region[0], "width": region[2], "height": region[3]}
-        
-        if not capture_region or capture_region["width"] <= 0 or capture_region["height"] <= 0:
-            # print(f"Tentativa de capturar com região inválida ou não definida: {capture_region}")
+            grab = functools.partial(self.sct.grab, {"top": region[1], "left": region[0],
+                                                     "width": region[2], "height": region[3]})
+        elif grab is None:
+            # print(f"Tentativa de capturar com região inválida ou não definida: {self.region}")
             return None
 
         try:
-            sct_img = self.sct.grab(capture_region)
-            # Converter para array numpy BGR
-            img = np.array(sct_img)
-            img = img[:, :, :3] # Remover canal alfa se existir (BGRA -> BGR)
-            return img
+            sct_img = grab()
+            # View sem cópia sobre os bytes BGRA do grab (np.array(sct_img) copiaria o frame
+            # inteiro, e o recorte [:, :, :3] não é contíguo, forçando outra cópia depois)
+            bgra = np.frombuffer(sct_img.raw, dtype=np.uint8).reshape(sct_img.height, sct_img.width, 4)
+            if self.return_bgra:
+                return bgra
+            # Escreve no buffer que não é o do frame entregue por último
+            idx = 1 - self._ready_idx
+            frame_buf = self._frame_bufs[idx]
+            if frame_buf is None or frame_buf.shape[:2] != bgra.shape[:2]:
+                # Região diferente da configurada (argumento region ou grab cortado pela tela)
+                frame_buf = self._frame_bufs[idx] = np.empty((bgra.shape[0], bgra.shape[1], 3), dtype=np.uint8)
+            cv2.cvtColor(bgra, cv2.COLOR_BGRA2BGR, dst=frame_buf)
+            self._ready_idx = idx
+            return frame_buf
         except mss.exception.ScreenShotError as e:
             # Comum se a região for inválida (ex: fora da tela) ou a janela não existir mais.
             # print(f"MSS ScreenShotError: {e}. Verifique a região de captura: {capture_region}")
             return None
         except Exception as e:
-            print(f"Erro ao capturar frame com MSS: {e}")
+            if _throttle("mss"):
+                logger.warning("Erro ao capturar frame com MSS: %s", e)
             return None
 
 class DXCamCapturer(ScreenCapturerBase):
-    """Capturador de tela usando a biblioteca DXcam."""
-    def __init__(self, target_fps: int = 30, device_idx: int = 0, output_idx: int = 0):
+    """
+    Capturador de tela usando a biblioteca DXcam.
+
+    Args:
+        target_fps: FPS desejado para a captura.
+        device_idx: Índice do dispositivo GPU.
+        output_idx: Índice do monitor conectado à GPU.
+        video_mode: Se True (padrão), usa o modo de vídeo do DXcam (camera.start): uma thread do
+                    próprio DXcam captura a região no ritmo de target_fps num buffer circular e
+                    capture_frame só pega o frame mais recente. Com False, cada capture_frame faz
+                    um camera.grab() síncrono, cuja latência varia bastante de frame a frame.
+        return_bgra: Se True, retorna os frames BGRA como vêm da duplicação do desktop, sem
+                     conversão. Se False (padrão), o próprio DXcam converte para BGR (cv2.cvtColor).
+    """
+    _non_picklable = ("camera", "_video_region", "_last_frame", "_grab")
+
+    def __init__(self, target_fps: int = 30, device_idx: int = 0, output_idx: int = 0, video_mode: bool = True,
+                 return_bgra: bool = False):
         super().__init__(target_fps)
         self.camera: dxcam.DXCamera | None = None
         self.device_idx = device_idx
         self.output_idx = output_idx
+        self.video_mode = video_mode
+        self.return_bgra = return_bgra
         self._region_for_dxcam: tuple[int, int, int, int] | None = None # left, top, right, bottom
+        self._video_region: tuple[int, int, int, int] | None = None # Região do modo de vídeo ativo
+        self._last_frame: np.ndarray | None = None # Último frame do modo de vídeo
+        self._grab = None # Captura da região padrão já resolvida (ver _preparar_grab)
 
     def start(self):
         try:
             # DXcam lida com FPS internamente se especificado na captura.
             # O construtor do DXCamera não leva FPS diretamente, é no grab.
-            self.camera = dxcam.create(device_idx=self.device_idx, output_idx=self.output_idx)
+            # O padrão do DXcam é RGB; pede BGR (ou BGRA, sem conversão) direto na criação para o
+            # frame já sair no formato do OpenCV, sem uma segunda troca de canais depois
+            self.camera = dxcam.create(device_idx=self.device_idx, output_idx=self.output_idx,
+                                       output_color="BGRA" if self.return_bgra else "BGR")
             if self.camera is None:
                  raise Exception("Falha ao criar instância DXCamera (dxcam.create retornou None)")
-            # DXcam não tem um método start explícito como o MSS para o objeto mss() em si,
-            # mas podemos considerar "iniciado" quando o objeto camera existe.
-            # A captura real é iniciada com camera.start_video_capture ou frame a frame com grab.
-            # Para consistência com ScreenCapturerBase, vamos usar grab por enquanto.
+            # No modo de vídeo a captura contínua (camera.start) precisa da região, então só
+            # começa aqui se ela já foi definida; senão começa no set_region.
             super().start()
+            self._ready = self.camera is not None
+            if self.video_mode and self._region_for_dxcam:
+                self._start_video(self._region_for_dxcam)
+            self._preparar_grab()
             print(f"DXCam Capturer pronto. Device: {self.device_idx}, Output: {self.output_idx}")
         except Exception as e:
             print(f"Erro ao iniciar DXCam Capturer: {e}")
-            self._running = False
+            self._running = self._ready = False
             if self.camera:
                 try:
                     self.camera.release() # Garante que a câmera seja liberada
@@ -141,10 +416,10 @@ class DXCamCapturer(ScreenCapturerBase):
 
 
     def stop(self):
+        self._grab = None
         if self.camera:
             try:
-                # Se estivéssemos usando start_video_capture(), chamaríamos stop_video_capture() aqui.
-                # Como estamos usando grab(), apenas liberar a câmera é suficiente.
+                self._stop_video()
                 self.camera.release()
             except Exception as e:
                  print(f"Erro ao liberar câmera DXcam: {e}")
@@ -152,6 +427,22 @@ class DXCamCapturer(ScreenCapturerBase):
         super().stop()
         print("DXCam Capturer parado.")
 
+    def _start_video(self, region: tuple[int, int, int, int]):
+        """(Re)inicia o modo de vídeo do DXcam na região (left, top, right, bottom)."""
+        self._stop_video()
+        try:
+            self.camera.start(region=region, target_fps=self.target_fps, video_mode=True)
+            self._video_region = region
+        except Exception as e:
+            print(f"Erro ao iniciar o modo de vídeo do DXcam, usando grab(): {e}")
+            self._video_region = None
+
+    def _stop_video(self):
+        if self._video_region is not None:
+            self._video_region = None
+            self._last_frame = None
+            self.camera.stop()
+
     def set_region(self, x: int, y: int, width: int, height: int):
         if width <= 0 or height <= 0:
             print(f"Erro: Região de captura inválida para DXCam: w={width}, h={height}")
@@ -160,41 +451,607 @@ class DXCamCapturer(ScreenCapturerBase):
         # DXcam espera (left, top, right, bottom)
         self._region_for_dxcam = (x, y, x + width, y + height)
         # print(f"DXCam internal region set to: {self._region_for_dxcam}")
+        # A região do modo de vídeo é fixa: recomeça a captura contínua na nova região
+        if self.video_mode and self.camera and self.is_running() and self._video_region != self._region_for_dxcam:
+            self._start_video(self._region_for_dxcam)
+        self._preparar_grab()
 
+    def _preparar_grab(self):
+        """
+        Resolve uma vez como capturar a região padrão: o frame mais recente do modo de vídeo, se
+        ele está ativo nela, ou camera.grab com a região já embutida. capture_frame sem argumento
+        só chama o resultado, sem refazer a montagem e as comparações da região a cada frame.
+        """
+        if not self.camera or not self._region_for_dxcam:
+            self._grab = None
+        elif self._video_region == self._region_for_dxcam:
+            self._grab = self._latest_frame
+        else:
+            self._grab = functools.partial(self.camera.grab, region=self._region_for_dxcam)
+
+    def _latest_frame(self) -> np.ndarray | None:
+        """
+        Modo de vídeo: o frame mais recente do buffer circular do DXcam. None significa que não
+        chegou frame novo desde a última chamada (tela parada); reaproveita o último em vez de
+        capturar de novo.
+        """
+        frame = self.camera.get_latest_frame()
+        if frame is None:
+            return self._last_frame
+        self._last_frame = frame
+        return frame
 
     def capture_frame(self, region: tuple[int, int, int, int] | None = None) -> np.ndarray | None:
-        if not self.is_running() or not self.camera:
+        if not self._ready:
             # print("DXCam Capturer não está rodando ou não inicializado.")
             return None
 
-        dxcam_region_to_capture = self._region_for_dxcam
+        # Sem region, usa a captura da região padrão resolvida em _preparar_grab
+        grab = self._grab
         if region: # Formato (x, y, w, h)
             if region[2] <=0 or region[3] <=0:
                 # print(f"Região de captura inválida fornecida para DXCam: {region}")
                 return None
             dxcam_region_to_capture = (region[0], region[1], region[0] + region[2], region[1] + region[3])
-
-        if not dxcam_region_to_capture:
-            # print(f"Tentativa de capturar com DXCam sem região definida: {dxcam_region_to_capture}")
+            if dxcam_region_to_capture == self._video_region:
+                grab = self._latest_frame
+            else:
+                grab = functools.partial(self.camera.grab, region=dxcam_region_to_capture)
+        elif grab is None:
+            # print(f"Tentativa de capturar com DXCam sem região definida: {self._region_for_dxcam}")
             return None
-            
+
         try:
-            # DXcam retorna None se a região for inválida (ex: totalmente fora da tela)
-            frame = self.camera.grab(region=dxcam_region_to_capture)
-            if frame is not None:
-                # DXcam já retorna um array numpy BGR, então nenhuma conversão é necessária.
-                return frame
-            else:
-                # print(f"DXcam.grab() retornou None para a região {dxcam_region_to_capture}. A região pode ser inválida ou a janela não visível.")
-                return None
+            # DXcam já retorna um array numpy BGR (ou BGRA), então nenhuma conversão é necessária.
+            # grab() retorna None se a região for inválida (ex: totalmente fora da tela) ou a
+            # janela não estiver visível.
+            return grab()
         except Exception as e:
             # DXcam pode lançar exceções se houver problemas com o dispositivo DirectX
-            print(f"Erro ao capturar frame com DXCam: {e}")
+            if _throttle("dxcam"):
+                logger.warning("Erro ao capturar frame com DXCam: %s", e)
             # Em caso de erro grave, pode ser útil tentar reiniciar a câmera.
             # self.stop()
             # self.start() # Cuidado com recursão ou loops de falha aqui
             return None
 
+class WGCCapturer(ScreenCapturerBase):
+    """
+    Capturador de tela usando o Windows.Graphics.Capture (WinRT), pelo pacote windows-capture.
+
+    Captura a janela alvo (self.hwnd, definido em select_and_configure_capture_region ou pelos
+    argumentos hwnd/window_title) mesmo que esteja coberta por outras, ou o monitor principal se
+    não houver janela. O WGC só
+    entrega frames quando o conteúdo muda, numa thread própria do windows-capture; o callback
+    recorta a região e a publica num _TripleBuffer, e capture_frame só pega o frame mais
+    recente, reaproveitando o último se não chegou um novo (tela parada).
+
+    A região é fixa durante a captura; capture_frame com o argumento region retorna None.
+
+    Args:
+        target_fps: FPS desejado (o ritmo real é o de composição do DWM).
+        return_bgra: Se True, retorna o recorte BGRA como vem do WGC. Se False (padrão),
+                     converte para BGR no callback.
+        timeout: Tempo máximo (s) que a primeira captura espera pelo primeiro frame.
+        hwnd: HWND da janela a capturar (o mesmo que definir self.hwnd).
+        window_title: Título exato da janela a capturar, resolvido para um HWND em start() se
+                      hwnd não for dado. Com várias janelas de mesmo título, usa a primeira e avisa.
+
+    Versões do windows-capture sem o argumento window_hwnd escolhem a janela por substring do
+    título; nesse caso o título completo da janela alvo é passado e há um aviso se outras
+    janelas também o contêm.
+    """
+    _non_picklable = ("_capture", "_control", "_buffer", "_last_frame", "_conv_buf")
+
+    def __init__(self, target_fps: int = 30, return_bgra: bool = False, timeout: float = 1.0,
+                 hwnd: int | None = None, window_title: str | None = None):
+        super().__init__(target_fps)
+        self.hwnd = hwnd
+        self.window_title = window_title
+        self.return_bgra = return_bgra
+        self.timeout = timeout
+        self._capture = None
+        self._control = None # CaptureControl da thread do WGC
+        self._buffer: _TripleBuffer | None = None
+        self._last_frame: np.ndarray | None = None
+        self._conv_buf: np.ndarray | None = None # Destino da conversão BGRA -> BGR no callback
+        self._hwnd_alvo: int | None = None # Janela capturada (None: monitor principal)
+        self._origem = (0, 0) # Canto (x, y) na tela do que o WGC captura
+        self._recorte: tuple[int, int, int, int] | None = None # (x, y, largura, altura) no frame do WGC
+
+    def _atualizar_recorte(self):
+        """Converte a região (coordenadas de tela) em recorte no frame capturado."""
+        if self._hwnd_alvo:
+            rect = get_window_frame_rect(self._hwnd_alvo)
+            if rect:
+                self._origem = rect[:2]
+        r = self.region
+        if r["width"] > 0 and r["height"] > 0:
+            self._recorte = (r["left"] - self._origem[0], r["top"] - self._origem[1], r["width"], r["height"])
+
+    def start(self):
+        if WindowsCapture is None:
+            print("Erro ao iniciar WGC Capturer: o pacote windows-capture não está instalado.")
+            self._running = self._ready = False
+            return
+        try:
+            if not self.hwnd and self.window_title:
+                self.hwnd = self._resolver_titulo(self.window_title)
+            if self.hwnd and _user32 is not None and is_window_capturable(self.hwnd):
+                self._hwnd_alvo = self.hwnd
+                self._capture = self._criar_captura_janela(self.hwnd)
+            else:
+                self._hwnd_alvo = None
+                self._origem = (0, 0)
+                self._capture = WindowsCapture(cursor_capture=False, draw_border=False)
+            self._atualizar_recorte()
+            self._buffer = _TripleBuffer()
+            self._last_frame = None
+
+            # O windows-capture registra os handlers pelo nome da função
+            def on_frame_arrived(frame, capture_control):
+                if not self._running:
+                    capture_control.stop()
+                    return
+                self._publicar(frame.frame_buffer)
+
+            def on_closed():
+                # Janela fechada ou captura encerrada: libera quem espera em capture_frame
+                self._ready = False
+                self._buffer.close()
+
+            self._capture.event(on_frame_arrived)
+            self._capture.event(on_closed)
+            super().start()
+            self._control = self._capture.start_free_threaded()
+            print("WGC Capturer iniciado.")
+        except Exception as e:
+            print(f"Erro ao iniciar WGC Capturer: {e}")
+            self._running = self._ready = False
+            self._capture = self._control = None
+
+    @staticmethod
+    def _resolver_titulo(titulo: str) -> int | None:
+        """HWND da janela com exatamente esse título (a primeira, avisando se houver várias)."""
+        hwnds = [hwnd for hwnd, t, _ in list_windows() if t == titulo]
+        if not hwnds:
+            print(f"AVISO: Nenhuma janela com o título \"{titulo}\"; capturando o monitor principal.")
+            return None
+        if len(hwnds) > 1:
+            print(f"AVISO: {len(hwnds)} janelas com o título \"{titulo}\"; usando a primeira (ID: {hwnds[0]}).")
+        return hwnds[0]
+
+    @staticmethod
+    def _criar_captura_janela(hwnd: int):
+        """
+        Cria o WindowsCapture da janela hwnd: pelo próprio HWND quando o windows-capture aceita
+        window_hwnd; senão pelo título, que ele compara por substring.
+        """
+        try:
+            return WindowsCapture(cursor_capture=False, draw_border=False, window_hwnd=hwnd)
+        except TypeError: # Versão sem window_hwnd
+            pass
+        titulo = get_window_title(hwnd)
+        outras = [t for h, t, _ in list_windows() if h != hwnd and titulo in t]
+        if outras:
+            print(f"AVISO: O windows-capture escolhe a janela pelo título, e \"{titulo}\" também aparece em "
+                  f"{len(outras)} outra(s) janela(s) ({', '.join(repr(t) for t in outras[:3])}); "
+                  "a captura pode pegar a janela errada.")
+        return WindowsCapture(cursor_capture=False, draw_border=False, window_name=titulo)
+
+    def stop(self):
+        super().stop()
+        if self._control:
+            try:
+                self._control.stop()
+            except Exception as e:
+                print(f"Erro ao parar WGC Capturer: {e}")
+            self._control = None
+        self._capture = None
+        if self._buffer:
+            self._buffer.close(discard=True)
+        print("WGC Capturer parado.")
+
+    def set_region(self, x: int, y: int, width: int, height: int):
+        if width <= 0 or height <= 0:
+            print(f"Erro: Região de captura inválida para WGC: w={width}, h={height}")
+            return
+        super().set_region(x, y, width, height)
+        if self._running and self.hwnd and self.hwnd != self._hwnd_alvo:
+            # Janela escolhida depois do start(): passa a capturar ela em vez do monitor
+            self.stop()
+            self.start()
+        else:
+            self._atualizar_recorte() # Lido pelo callback numa única atribuição
+
+    def _publicar(self, bgra: np.ndarray):
+        """Recorta a região do frame do WGC (válido só durante o callback) e a publica."""
+        if self._recorte:
+            x, y, w, h = self._recorte
+            bgra = bgra[max(y, 0):max(y + h, 0), max(x, 0):max(x + w, 0)]
+            if bgra.size == 0:
+                return
+        if self.return_bgra:
+            self._buffer.write(bgra)
+            return
+        if self._conv_buf is None or self._conv_buf.shape[:2] != bgra.shape[:2]:
+            self._conv_buf = np.empty((bgra.shape[0], bgra.shape[1], 3), dtype=np.uint8)
+        cv2.cvtColor(bgra, cv2.COLOR_BGRA2BGR, dst=self._conv_buf)
+        self._buffer.write(self._conv_buf)
+
+    def capture_frame(self, region: tuple[int, int, int, int] | None = None) -> np.ndarray | None:
+        if not self._ready or region:
+            return None
+        # Sem frame novo, o último lido continua válido: o produtor nunca escreve no slot em uso
+        frame = self._buffer.read(0 if self._last_frame is not None else self.timeout)
+        if frame is None:
+            return self._last_frame
+        self._last_frame = frame
+        return frame
+
+class _TripleBuffer:
+    """
+    Passa frames de uma thread produtora para uma consumidora por 3 slots pré-alocados. O
+    produtor sempre escreve num slot que não é nem o último publicado nem o que o consumidor
+    está usando, então nunca espera e nunca sobrescreve o frame em uso; se o consumidor
+    atrasa, os frames não lidos mais antigos são descartados.
+
+    Só a troca de índices é feita sob o lock (o CPython não tem compare-and-swap); a cópia do
+    frame para o slot fica fora dele.
+    """
+    NUM_SLOTS = 3
+
+    def __init__(self):
+        self._slots: list[np.ndarray | None] = [None] * self.NUM_SLOTS
+        self._lock = threading.Lock()
+        self._publicado: int | None = None # Slot com o frame mais recente ainda não lido
+        self._em_uso: int | None = None    # Slot entregue ao consumidor na última leitura
+        self._novo_frame = threading.Event()
+        self._fechado = False
+
+    def write(self, frame: np.ndarray):
+        """Copia o frame para um slot livre e o publica como o mais recente."""
+        with self._lock:
+            livre = next(i for i in range(self.NUM_SLOTS) if i != self._publicado and i != self._em_uso)
+        slot = self._slots[livre]
+        if slot is None or slot.shape != frame.shape or slot.dtype != frame.dtype:
+            slot = self._slots[livre] = np.empty_like(frame)
+        np.copyto(slot, frame)
+        with self._lock:
+            self._publicado = livre
+            self._novo_frame.set()
+
+    def read(self, timeout: float | None = None) -> np.ndarray | None:
+        """
+        Retorna o frame mais recente ainda não lido, esperando até timeout segundos por um.
+        O array pertence ao consumidor até a próxima leitura. None se não houver frame novo.
+        """
+        if not self._novo_frame.wait(timeout):
+            return None
+        with self._lock:
+            idx = self._publicado
+            if not self._fechado:
+                self._novo_frame.clear()
+            if idx is None:
+                return None
+            self._em_uso, self._publicado = idx, None
+        return self._slots[idx]
+
+    def close(self, discard: bool = False):
+        """Libera consumidores esperando em read(); com discard, descarta o frame não lido."""
+        with self._lock:
+            self._fechado = True
+            if discard:
+                self._publicado = None
+            self._novo_frame.set()
+
+class ThreadedCapturer(ScreenCapturerBase):
+    """
+    Envolve outro capturador e captura numa thread própria (produtor), deixando os frames num
+    triple buffer (_TripleBuffer). capture_frame (consumidor) pega o frame mais recente sem
+    esperar pela captura, então a latência do grab se sobrepõe à detecção/exibição; se o
+    consumidor atrasa, os frames mais antigos não lidos são descartados.
+
+    O capturador interno é iniciado, usado e parado só pela thread de captura: alguns backends
+    prendem os handles nativos à thread que os criou (o mss guarda os handles GDI num
+    threading.local preenchido no start()). Pelo mesmo motivo, set_region com a captura rodando
+    é repassado à thread de captura.
+
+    O frame retornado por capture_frame pertence ao consumidor até a próxima chamada.
+    """
+
+    def __init__(self, capturer: ScreenCapturerBase, timeout: float = 1.0):
+        """
+        Args:
+            capturer: Capturador real (MSSCapturer, DXCamCapturer, ...). É iniciado na thread de
+                      captura; se já estiver rodando, start() o para e o reinicia lá.
+            timeout: Tempo máximo (s) que capture_frame espera por um frame novo antes de
+                     retornar None (e que set_region espera pela thread de captura).
+        """
+        super().__init__(capturer.target_fps)
+        self.capturer = capturer
+        self.timeout = timeout
+        self.region = capturer.region
+        self._buffer = _TripleBuffer()
+        self._thread: threading.Thread | None = None
+        self._iniciado = threading.Event()
+        self._lock_regiao = threading.Lock()
+        self._regiao_pendente: tuple[tuple[int, int, int, int], threading.Event] | None = None
+
+    def start(self):
+        if self.capturer.is_running():
+            # Handles criados na thread atual; são recriados na thread de captura
+            self.capturer.stop()
+        super().start()
+        self._buffer = _TripleBuffer()
+        self._iniciado = threading.Event()
+        self._thread = threading.Thread(target=self._capture_loop, name="ThreadedCapturer", daemon=True)
+        self._thread.start()
+        self._iniciado.wait()
+        if not self.capturer.is_running():
+            print("Erro ao iniciar ThreadedCapturer: o capturador interno não iniciou.")
+            self.stop()
+
+    def stop(self):
+        super().stop()
+        self._buffer.close(discard=True) # Acorda um consumidor esperando em capture_frame
+        if self._thread and self._thread is not threading.current_thread():
+            # O capturador interno é parado pela própria thread de captura, ao sair do laço
+            self._thread.join(timeout=1.0)
+        self._thread = None
+
+    def set_region(self, x: int, y: int, width: int, height: int):
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            self.capturer.set_region(x, y, width, height)
+            self.region = self.capturer.region
+            return
+        aplicada = threading.Event()
+        with self._lock_regiao:
+            self._regiao_pendente = ((x, y, width, height), aplicada)
+        if not aplicada.wait(self.timeout):
+            print("Erro: A thread de captura não aplicou a nova região a tempo.")
+        self.region = self.capturer.region
+
+    def _aplicar_regiao_pendente(self):
+        """Aplica no capturador interno a região pedida por set_region (na thread de captura)."""
+        with self._lock_regiao:
+            pendente, self._regiao_pendente = self._regiao_pendente, None
+        if pendente:
+            regiao, aplicada = pendente
+            self.capturer.set_region(*regiao)
+            aplicada.set()
+
+    def _capture_loop(self):
+        try:
+            self.capturer.start()
+        finally:
+            self._iniciado.set()
+        try:
+            proximo = time.monotonic_ns()
+            while self._running and self.capturer.is_running():
+                self._aplicar_regiao_pendente()
+                frame = self.capturer.capture_frame()
+                if frame is not None:
+                    self._buffer.write(frame)
+
+                # Mantém o ritmo do target_fps do capturador interno
+                if self.frame_time > 0:
+                    proximo += int(self.frame_time * 1e9)
+                    agora = time.monotonic_ns()
+                    if proximo > agora:
+                        sleep_until(proximo)
+                    else:
+                        proximo = agora # Atrasou: não tenta compensar os frames perdidos
+        finally:
+            self.capturer.stop()
+            self._aplicar_regiao_pendente() # Capturador parado: um set_region em espera vale direto
+            # O último frame capturado ainda pode ser lido
+            self._running = False
+            self._buffer.close()
+
+    def capture_frame(self, region: tuple[int, int, int, int] | None = None) -> np.ndarray | None:
+        """
+        Retorna o frame mais recente. Com region (x, y, largura, altura, em coordenadas de tela),
+        retorna uma view (sem cópia) desse frame recortada na região, ou None se ela não estiver
+        inteira dentro da região capturada: o capturador interno só é usado pela thread de
+        captura, então regiões fora dela não podem ser capturadas à parte.
+        """
+        frame = self._buffer.read(self.timeout)
+        if frame is None or not region:
+            return frame
+        regiao = self.region
+        if frame.shape[:2] != (regiao["height"], regiao["width"]):
+            return None # Frame ainda da região anterior a um set_region
+        x, y, w, h = region
+        x0, y0 = x - regiao["left"], y - regiao["top"]
+        if w <= 0 or h <= 0 or x0 < 0 or y0 < 0 or x0 + w > regiao["width"] or y0 + h > regiao["height"]:
+            return None
+        return frame[y0:y0 + h, x0:x0 + w]
+
+class FrameDisplay:
+    """
+    Exibe frames numa janela do OpenCV a partir de uma thread própria, tirando cv2.imshow e
+    cv2.waitKey (>= 1 ms por chamada) do laço de captura. show() só copia o frame para um
+    _TripleBuffer; se a exibição não acompanha, os frames intermediários são descartados. A
+    janela é criada, atualizada e destruída pela thread de exibição.
+    """
+
+    def __init__(self, window_name: str):
+        self.window_name = window_name
+        self.quit_requested = False # 'q' pressionado na janela
+        self.error: Exception | None = None # Erro ao criar a janela, se houver
+        self._buffer = _TripleBuffer()
+        self._running = False
+        self._pronta = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> bool:
+        """Inicia a thread de exibição e espera a janela ser criada. Retorna False se falhar."""
+        self._running = True
+        self._thread = threading.Thread(target=self._display_loop, name="FrameDisplay", daemon=True)
+        self._thread.start()
+        self._pronta.wait()
+        return self.error is None
+
+    def show(self, frame: np.ndarray):
+        """Entrega um frame para exibição (copiado; o chamador pode reutilizar o array)."""
+        self._buffer.write(frame)
+
+    def stop(self):
+        self._running = False
+        self._buffer.close(discard=True)
+        if self._thread:
+            self._thread.join(timeout=1.0)
+        self._thread = None
+
+    def _display_loop(self):
+        try:
+            cv2.namedWindow(self.window_name, cv2.WINDOW_NORMAL)
+        except cv2.error as e:
+            self.error = e
+            self._running = False
+            self._pronta.set()
+            return
+        self._pronta.set()
+
+        while self._running:
+            frame = self._buffer.read(timeout=0.01)
+            if frame is not None:
+                cv2.imshow(self.window_name, frame)
+            # Também processa os eventos da janela quando não há frame novo
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                self.quit_requested = True
+        cv2.destroyWindow(self.window_name)
+
+def _capture_process_loop(capturer: ScreenCapturerBase, shm_name: str, shape: tuple[int, int, int], lock,
+                          publicado, em_uso, novo_frame, parar):
+    """
+    Laço do processo de captura do ProcessCapturer: captura com o capturador recebido e copia
+    cada frame para um slot livre da memória compartilhada (nem o último publicado nem o que o
+    processo principal está lendo), publicando o índice dele.
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    slots = None
+    try:
+        slots = np.ndarray((ProcessCapturer.NUM_SLOTS,) + shape, dtype=np.uint8, buffer=shm.buf)
+        capturer.start()
+        proximo = time.monotonic_ns()
+        while not parar.is_set() and capturer.is_running():
+            frame = capturer.capture_frame()
+            if frame is not None and frame.shape == shape:
+                with lock:
+                    livre = next(i for i in range(ProcessCapturer.NUM_SLOTS) if i != publicado.value and i != em_uso.value)
+                np.copyto(slots[livre], frame)
+                with lock:
+                    publicado.value = livre
+                    novo_frame.set()
+
+            if capturer.frame_time > 0:
+                proximo += int(capturer.frame_time * 1e9)
+                agora = time.monotonic_ns()
+                if proximo > agora:
+                    sleep_until(proximo)
+                else:
+                    proximo = agora
+    finally:
+        capturer.stop()
+        del slots
+        shm.close()
+        novo_frame.set()
+
+class ProcessCapturer(ScreenCapturerBase):
+    """
+    Roda outro capturador (MSSCapturer, DXCamCapturer) num processo separado, fora do GIL do
+    processo principal. Os frames chegam por 3 slots em multiprocessing.shared_memory, com a
+    mesma troca de índices do _TripleBuffer (índices em multiprocessing.Value sob um Lock):
+    uma única cópia por frame, feita no processo de captura.
+
+    A região deve ser definida antes de start() (o tamanho dos slots depende dela) e não pode
+    mudar com a captura rodando. O frame retornado por capture_frame é uma view da memória
+    compartilhada e pertence ao consumidor até a próxima chamada; continua legível depois de
+    stop(), já que o mapeamento só é fechado quando não resta nenhuma view dele.
+    """
+    NUM_SLOTS = 3
+
+    def __init__(self, capturer: ScreenCapturerBase, channels: int = 3, timeout: float = 1.0):
+        """
+        Args:
+            capturer: Capturador a ser executado no outro processo (é enviado por pickle e
+                      iniciado lá; deve estar parado aqui).
+            channels: Canais dos frames do capturador (3 para BGR, 4 com return_bgra=True).
+            timeout: Tempo máximo (s) que capture_frame espera por um frame novo.
+        """
+        super().__init__(capturer.target_fps)
+        self.capturer = capturer
+        self.channels = channels
+        self.timeout = timeout
+        self.region = capturer.region
+        self._shm: shared_memory.SharedMemory | None = None
+        self._slots: np.ndarray | None = None
+        self._process: multiprocessing.Process | None = None
+
+    def start(self):
+        width, height = self.capturer.region["width"], self.capturer.region["height"]
+        if width <= 0 or height <= 0:
+            print("Erro ao iniciar ProcessCapturer: defina a região de captura antes de start().")
+            self._running = False
+            return
+        shape = (height, width, self.channels)
+        self._shm = shared_memory.SharedMemory(create=True, size=self.NUM_SLOTS * height * width * self.channels)
+        self._slots = np.ndarray((self.NUM_SLOTS,) + shape, dtype=np.uint8, buffer=self._shm.buf)
+        # O numpy não segura o buffer exportado, então fechar o shm com frames ainda vivos deixaria
+        # views apontando para memória desmapeada. Os frames são views de _slots e o mantêm vivo:
+        # o mapeamento é fechado só quando o último deles for coletado.
+        weakref.finalize(self._slots, self._shm.close)
+        self._lock = multiprocessing.Lock()
+        self._publicado = multiprocessing.Value("i", -1, lock=False) # Protegidos por self._lock
+        self._em_uso = multiprocessing.Value("i", -1, lock=False)
+        self._novo_frame = multiprocessing.Event()
+        self._parar = multiprocessing.Event()
+        self._process = multiprocessing.Process(
+            target=_capture_process_loop, name="ProcessCapturer", daemon=True,
+            args=(self.capturer, self._shm.name, shape, self._lock, self._publicado, self._em_uso,
+                  self._novo_frame, self._parar))
+        self._process.start()
+        super().start()
+
+    def stop(self):
+        if self._process:
+            self._parar.set()
+            self._process.join(timeout=2.0)
+            if self._process.is_alive():
+                self._process.terminate()
+            self._process = None
+        if self._shm:
+            # Remove só o nome; o close fica com o finalizador de _slots (ver start)
+            self._shm.unlink()
+            self._shm = None
+            self._slots = None
+        super().stop()
+
+    def set_region(self, x: int, y: int, width: int, height: int):
+        if self._process:
+            print("Erro: A região do ProcessCapturer não pode mudar com a captura rodando.")
+            return
+        self.capturer.set_region(x, y, width, height)
+        self.region = self.capturer.region
+
+    def capture_frame(self, region: tuple[int, int, int, int] | None = None) -> np.ndarray | None:
+        if region:
+            # Regiões avulsas não passam pelo processo de captura
+            return None
+        if not self._process or not self._novo_frame.wait(self.timeout):
+            return None
+        with self._lock:
+            idx = self._publicado.value
+            if self._process.is_alive():
+                self._novo_frame.clear()
+            if idx < 0:
+                return None
+            self._em_uso.value, self._publicado.value = idx, -1
+        return self._slots[idx]
+
 # --- Função de Configuração ---
 _active_capturer: ScreenCapturerBase | None = None
 
@@ -208,7 +1065,7 @@ def configure_captura(
     Configura e retorna um objeto de captura de tela.
 
     Args:
-        backend_choice: "mss" ou "dxcam".
+        backend_choice: "mss", "dxcam" ou "wgc".
         target_fps: FPS desejado para a captura.
         device_idx: Índice do dispositivo GPU para DXCam.
         output_idx: Índice do monitor conectado à GPU para DXCam.
@@ -230,8 +1087,10 @@ def configure_captura(
         capturer = MSSCapturer(target_fps=target_fps)
     elif backend_choice.lower() == "dxcam":
         capturer = DXCamCapturer(target_fps=target_fps, device_idx=device_idx, output_idx=output_idx)
+    elif backend_choice.lower() == "wgc":
+        capturer = WGCCapturer(target_fps=target_fps)
     else:
-        print(f"Backend de captura desconhecido: {backend_choice}. Escolha 'mss' ou 'dxcam'.")
+        print(f"Backend de captura desconhecido: {backend_choice}. Escolha 'mss', 'dxcam' ou 'wgc'.")
         return None
 
     capturer.start()
@@ -278,22 +1137,16 @@ def select_and_configure_capture_region(capturer: ScreenCapturerBase | None) ->
     print("\n--- Seleção de Janela para Captura ---")
     game_window_title: str | None = None # Para armazenar o título
     try:
-        windows = pygetwindow.getAllWindows()
-        if not windows:
-            print("Nenhuma janela encontrada.")
-            return None, None
-
-        print("Janelas disponíveis:")
-        available_windows = []
-        for i, window in enumerate(windows):
-            if window.title and window.width > 0 and window.height > 0:
-                available_windows.append(window)
-                print(f"  {len(available_windows)}: \"{window.title}\" (ID: {window._hWnd}, Tamanho: {window.width}x{window.height})")
-        
+        # Já filtradas (visíveis, com título e tamanho válido) na própria enumeração
+        available_windows = list_windows()
         if not available_windows:
             print("Nenhuma janela com título e dimensões válidas encontrada.")
             return None, None
 
+        print("Janelas disponíveis:")
+        for i, (hwnd, title, (_, _, width, height)) in enumerate(available_windows, start=1):
+            print(f"  {i}: \"{title}\" (ID: {hwnd}, Tamanho: {width}x{height})")
+
         while True:
             try:
                 choice_str = input(f"Digite o número da janela para capturar (1-{len(available_windows)}, ou '0' para cancelar): ")
@@ -302,8 +1155,8 @@ def select_and_configure_capture_region(capturer: ScreenCapturerBase | None) ->
                     print("Seleção de janela cancelada.")
                     return None, None
                 if 1 <= choice <= len(available_windows):
-                    game_window = available_windows[choice - 1]
-                    game_window_title = game_window.title # Armazena o título
+                    game_window_hwnd, game_window_title, game_window_rect = available_windows[choice - 1]
+                    capturer.hwnd = game_window_hwnd # Para verificar a janela depois sem enumerar todas
                     break
                 else:
                     print(f"Escolha inválida. Por favor, digite um número entre 1 e {len(available_windows)} (ou 0).")
@@ -312,11 +1165,12 @@ def select_and_configure_capture_region(capturer: ScreenCapturerBase | None) ->
             except IndexError:
                  print("Número fora do alcance das janelas listadas. Tente novamente.")
 
-        print(f"Janela selecionada: \"{game_window.title}\"")
-        x, y, w, h = game_window.left, game_window.top, game_window.width, game_window.height
+        print(f"Janela selecionada: \"{game_window_title}\"")
+        # Posição atual (a janela pode ter sido movida enquanto o usuário escolhia)
+        x, y, w, h = (get_window_rect(game_window_hwnd) if _user32 else None) or game_window_rect
         
         if w <= 0 or h <= 0:
-            print(f"Erro: A janela selecionada \"{game_window.title}\" tem dimensões inválidas (largura ou altura <= 0).")
+            print(f"Erro: A janela selecionada \"{game_window_title}\" tem dimensões inválidas (largura ou altura <= 0).")
             return None, game_window_title # Retorna título mesmo em falha de dimensão
 
         print(f"Configurando região de captura para: x={x}, y={y}, largura={w}, altura={h}")
@@ -339,6 +1193,10 @@ def select_and_configure_capture_region(capturer: ScreenCapturerBase | None) ->
 # --- Exemplo de Uso (para teste) ---
 if __name__ == "__main__":
     print("Iniciando teste de captura de tela...")
+    # As conversões de cor dos capturadores (BGRA -> BGR) dependem dos caminhos SIMD do OpenCV.
+    # É um estado global do OpenCV, então fica a cargo da aplicação, não da importação do módulo.
+    if not cv2.useOptimized():
+        cv2.setUseOptimized(True)
     
     captador = configure_captura(backend_choice="mss", target_fps=30)
     target_window_title: str | None = None
@@ -352,24 +1210,36 @@ if __name__ == "__main__":
             print(f"Capturador ativo: {type(captador).__name__}")
             print(f"FPS alvo: {captador.target_fps}")
             
-            import cv2 
-            try:
-                cv2.namedWindow("Teste Captura Calibrada", cv2.WINDOW_NORMAL)
-            except cv2.error as e:
-                print(f"Erro ao criar janela OpenCV: {e}.")
+            # A exibição roda em outra thread: imshow/waitKey não seguram o laço de captura
+            display = FrameDisplay("Teste Captura Calibrada")
+            if not display.start():
+                print(f"Erro ao criar janela OpenCV: {display.error}.")
                 if captador: captador.stop()
                 exit()
 
             start_time = time.time()
+            # Prazos absolutos (relógio monotônico): o atraso de um frame não se acumula nos seguintes
+            next_deadline = time.monotonic_ns()
             frames_captured = 0
             check_interval = 30 # Verificar estado da janela a cada X frames
             max_frames_to_test = 300 # Aumentado para dar mais tempo para o teste de janela
 
             while frames_captured < max_frames_to_test and captador.is_running():
-                loop_start_time = time.time()
-
                 # Verificação periódica da janela alvo
-                if frames_captured > 0 and frames_captured % check_interval == 0:
+                if frames_captured > 0 and frames_captured % check_interval == 0 and _user32 and captador.hwnd:
+                    # Pelo HWND guardado na seleção: poucas chamadas ao user32, sem enumerar janelas
+                    if not is_window_capturable(captador.hwnd):
+                        print(f"AVISO: Janela '{target_window_title}' foi fechada, não está visível ou está minimizada. Parando captura.")
+                        break
+                    rect = get_window_rect(captador.hwnd)
+                    if rect and rect != (selected_region_info["left"], selected_region_info["top"],
+                                         selected_region_info["width"], selected_region_info["height"]):
+                        # Só quando a janela foi movida/redimensionada a região é recalculada
+                        print(f"Janela '{target_window_title}' movida/redimensionada. Nova região: {rect}")
+                        captador.set_region(*rect)
+                        x_r, y_r, w_r, h_r = rect
+                        selected_region_info = {"top": y_r, "left": x_r, "width": w_r, "height": h_r}
+                elif frames_captured > 0 and frames_captured % check_interval == 0:
                     try:
                         target_windows = pygetwindow.getWindowsWithTitle(target_window_title)
                         if not target_windows:
@@ -393,8 +1263,8 @@ if __name__ == "__main__":
                 
                 if frame is not None and frame.size > 0:
                     frames_captured += 1
-                    cv2.imshow("Teste Captura Calibrada", frame)
-                    if cv2.waitKey(1) & 0xFF == ord('q'):
+                    display.show(frame)
+                    if display.quit_requested:
                         print("Tecla 'q' pressionada, parando...")
                         break
                 elif not captador.is_running(): # Se o captador parou por algum motivo interno
@@ -404,10 +1274,12 @@ if __name__ == "__main__":
                     # time.sleep(0.01) 
 
                 if captador.frame_time > 0:
-                    elapsed_time = time.time() - loop_start_time
-                    sleep_time = captador.frame_time - elapsed_time
-                    if sleep_time > 0:
-                        time.sleep(sleep_time)
+                    next_deadline += int(captador.frame_time * 1e9)
+                    now = time.monotonic_ns()
+                    if next_deadline > now:
+                        sleep_until(next_deadline)
+                    else:
+                        next_deadline = now # Frame atrasado: recomeça os prazos a partir de agora
             
             end_time = time.time()
             total_time = end_time - start_time if start_time else 0
@@ -416,7 +1288,7 @@ if __name__ == "__main__":
             print(f"Teste concluído. {frames_captured} frames capturados em {total_time:.2f} segundos.")
             print(f"FPS real médio: {actual_fps:.2f} FPS")
 
-            cv2.destroyAllWindows()
+            display.stop()
         else:
             print("Nenhuma região de captura foi configurada ou título da janela não obtido.")
         
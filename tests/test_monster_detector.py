@@ -0,0 +1,221 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import cv2
+import numpy as np
+
+import monster_detector
+
+
+def _criar_pasta_sprites(pasta: str, monstros: dict[str, list[np.ndarray]]):
+    """Grava os sprites BGR em pasta/<monstro>/<monstro>_<i>.png."""
+    for nome, sprites in monstros.items():
+        os.makedirs(os.path.join(pasta, nome), exist_ok=True)
+        for i, sprite in enumerate(sprites):
+            cv2.imwrite(os.path.join(pasta, nome, f"{nome}_{i}.png"), sprite)
+
+
+def _sprite_texturizado(rng: np.random.Generator, altura: int, largura: int) -> np.ndarray:
+    """Sprite com textura suave (como arte de jogo), que sobrevive à redução da pirâmide."""
+    ruido = rng.integers(0, 256, (altura, largura, 3), dtype=np.uint8)
+    return cv2.normalize(cv2.GaussianBlur(ruido, (0, 0), 1.5), None, 0, 255, cv2.NORM_MINMAX)
+
+
+class _ComPastaSprites(unittest.TestCase):
+    """Base dos testes que precisam de uma pasta de sprites temporária."""
+
+    def setUp(self):
+        self.pasta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.pasta, ignore_errors=True)
+        self.rng = np.random.default_rng(0)
+
+    def criar_detector(self, **kwargs) -> monster_detector.MonsterDetector:
+        kwargs.setdefault("usar_gpu", False)
+        kwargs.setdefault("num_threads", 1)
+        kwargs.setdefault("usar_cache_disco", False)
+        detector = monster_detector.MonsterDetector(self.pasta, **kwargs)
+        self.addCleanup(detector.fechar)
+        return detector
+
+
+class BackendGpuTest(_ComPastaSprites):
+    def test_fechar_restaura_estado_do_opencl(self):
+        _criar_pasta_sprites(self.pasta, {"Poring": [_sprite_texturizado(self.rng, 16, 16)]})
+        estado = {"ligado": False}
+        with mock.patch.object(cv2.ocl, "haveOpenCL", return_value=True), \
+                mock.patch.object(cv2.ocl, "useOpenCL", side_effect=lambda: estado["ligado"]), \
+                mock.patch.object(cv2.ocl, "setUseOpenCL", side_effect=lambda v: estado.update(ligado=v)), \
+                mock.patch.object(cv2, "cuda", create=True) as cuda:
+            cuda.getCudaEnabledDeviceCount.return_value = 0
+            detector = monster_detector.MonsterDetector(self.pasta, usar_gpu=True, metodo="ccoeff",
+                                                        usar_cache_disco=False)
+            self.assertEqual(detector._backend_gpu, "opencl")
+            self.assertTrue(estado["ligado"])
+            detector.fechar()
+            self.assertFalse(estado["ligado"])
+
+
+class CacheRotulosTest(unittest.TestCase):
+    def test_desenha_sem_detector_criado(self):
+        # cv2/numpy são importados sob demanda; a classe não pode depender de um MonsterDetector
+        with mock.patch.object(monster_detector, "cv2", None), mock.patch.object(monster_detector, "np", None):
+            rotulos = monster_detector.CacheRotulos()
+            frame = np.zeros((40, 120, 3), dtype=np.uint8)
+            rotulos.desenhar(frame, "Poring", 0.91, 5, 20)
+        self.assertTrue(frame.any())
+
+    def test_rotulo_reaproveitado_e_cortado_na_borda(self):
+        rotulos = monster_detector.CacheRotulos()
+        frame = np.zeros((40, 120, 3), dtype=np.uint8)
+        rotulos.desenhar(frame, "Poring", 0.91, 5, 20)
+        rotulos.desenhar(frame, "Poring", 0.89, -10, 5) # Mesmo rótulo (0.90), parcialmente fora
+        self.assertEqual(len(rotulos._rotulos), 1)
+
+
+class CacheDiscoTest(_ComPastaSprites):
+    def setUp(self):
+        super().setUp()
+        self.sprites = {"Poring": [_sprite_texturizado(self.rng, 16, 16), _sprite_texturizado(self.rng, 12, 20)],
+                        "Lunatic": [_sprite_texturizado(self.rng, 24, 24)]}
+        _criar_pasta_sprites(self.pasta, self.sprites)
+
+    def assertTemplatesIguais(self, detector):
+        for nome, sprites in self.sprites.items():
+            carregados = dict(zip(detector.template_filenames[nome], detector.templates[nome]))
+            self.assertEqual(len(carregados), len(sprites))
+            for i, original in enumerate(sprites):
+                np.testing.assert_array_equal(carregados[f"{nome}_{i}.png"], original)
+
+    def test_ida_e_volta(self):
+        self.criar_detector(usar_cache_disco=True)
+        with mock.patch.object(monster_detector.MonsterDetector, "_decodificar_sprites") as decodificar:
+            detector = self.criar_detector(usar_cache_disco=True)
+        decodificar.assert_not_called()
+        self.assertIsInstance(detector.templates["Poring"][0].base, np.memmap)
+        self.assertTemplatesIguais(detector)
+
+    def test_sprite_alterado_invalida_o_cache(self):
+        self.criar_detector(usar_cache_disco=True)
+        self.sprites["Poring"][0] = _sprite_texturizado(self.rng, 16, 16)
+        caminho = os.path.join(self.pasta, "Poring", "Poring_0.png")
+        cv2.imwrite(caminho, self.sprites["Poring"][0])
+        info = os.stat(caminho)
+        os.utime(caminho, ns=(info.st_atime_ns, info.st_mtime_ns + 1_000_000_000))
+        self.assertTemplatesIguais(self.criar_detector(usar_cache_disco=True))
+
+    def test_recarga_forcada_ignora_o_cache(self):
+        self.criar_detector(usar_cache_disco=True)
+        caminho = os.path.join(self.pasta, "Poring", "Poring_0.png")
+        info = os.stat(caminho)
+        # Sprite editado com o mtime de volta ao original; a chave é fixada porque o tamanho do
+        # PNG regravado pode mudar
+        with open(os.path.join(self.pasta, ".templates_cache.json"), encoding="utf-8") as f:
+            chave = json.load(f)["chave"]
+        antigo = self.sprites["Poring"][0]
+        self.sprites["Poring"][0] = 255 - antigo
+        cv2.imwrite(caminho, self.sprites["Poring"][0])
+        os.utime(caminho, ns=(info.st_atime_ns, info.st_mtime_ns))
+        with mock.patch.object(monster_detector.MonsterDetector, "_calcular_chave_cache", return_value=chave):
+            detector = self.criar_detector(usar_cache_disco=True)
+            np.testing.assert_array_equal(dict(zip(detector.template_filenames["Poring"],
+                                                   detector.templates["Poring"]))["Poring_0.png"], antigo)
+            detector.carregar_templates(forcar_recarregar=True)
+        self.assertTemplatesIguais(detector)
+
+    def test_falha_ao_trocar_o_npy_mantem_o_cache_anterior(self):
+        self.criar_detector(usar_cache_disco=True)
+        detector = self.criar_detector(usar_cache_disco=True)
+        with mock.patch.object(monster_detector.os, "replace", side_effect=OSError("arquivo mapeado")):
+            detector.carregar_templates(forcar_recarregar=True)
+        self.assertEqual(sorted(f for f in os.listdir(self.pasta) if f.startswith(".")),
+                         [".templates_cache.json", ".templates_cache.npy"])
+        with mock.patch.object(monster_detector.MonsterDetector, "_decodificar_sprites") as decodificar:
+            self.assertTemplatesIguais(self.criar_detector(usar_cache_disco=True))
+        decodificar.assert_not_called()
+
+    def test_indice_que_nao_e_objeto_recarrega_os_pngs(self):
+        self.criar_detector(usar_cache_disco=True)
+        with open(os.path.join(self.pasta, ".templates_cache.json"), "w", encoding="utf-8") as f:
+            f.write("[1, 2]")
+        with self.assertLogs(monster_detector.logger, "WARNING"):
+            self.assertTemplatesIguais(self.criar_detector(usar_cache_disco=True))
+
+
+class PiramideTest(_ComPastaSprites):
+    def setUp(self):
+        super().setUp()
+        # Textura fina: a correlação no nível reduzido depende bastante da fase do sprite na grade
+        self.sprites = []
+        for _ in range(6):
+            ruido = self.rng.integers(0, 256, (32, 32, 3), dtype=np.uint8)
+            self.sprites.append(cv2.normalize(cv2.GaussianBlur(ruido, (0, 0), 0.7), None, 0, 255, cv2.NORM_MINMAX))
+        _criar_pasta_sprites(self.pasta, {f"M{k}": [sprite] for k, sprite in enumerate(self.sprites)})
+        self.fundo = cv2.GaussianBlur(self.rng.integers(0, 256, (160, 240, 3), dtype=np.uint8), (0, 0), 3)
+
+    def frames_com_deslocamentos(self):
+        """Um frame por deslocamento (dx, dy) de 0 a 3 px, cobrindo todas as fases até 1/4."""
+        for dy in range(4):
+            for dx in range(4):
+                frame = self.fundo.copy()
+                posicoes = {}
+                for k, sprite in enumerate(self.sprites):
+                    x, y = 8 + (k % 3) * 76 + dx, 8 + (k // 3) * 76 + dy
+                    frame[y:y + 32, x:x + 32] = sprite
+                    posicoes[f"M{k}"] = (x, y)
+                yield frame, posicoes
+
+    def test_encontra_sprite_em_todas_as_fases(self):
+        for escala in (0.5, 0.25):
+            detector = self.criar_detector(escala_piramide=escala, detectar_incremental=False)
+            for frame, posicoes in self.frames_com_deslocamentos():
+                encontrados = {(d["nome"], d["regiao"][:2]) for d in detector.detectar_monstros(frame, threshold=0.8)}
+                for nome, posicao in posicoes.items():
+                    with self.subTest(escala=escala, nome=nome, posicao=posicao):
+                        self.assertIn((nome, posicao), encontrados)
+
+    def test_piramide_igual_a_resolucao_total(self):
+        piramide = self.criar_detector(detectar_incremental=False)
+        total = self.criar_detector(escala_piramide=1.0, detectar_incremental=False)
+        for frame, _ in self.frames_com_deslocamentos():
+            # Todas as confianças empatam em 1.0, então a ordem da saída não é comparável
+            esperado = sorted((d["nome"], d["regiao"], d["confianca"]) for d in total.detectar_monstros(frame, threshold=0.8))
+            obtido = sorted((d["nome"], d["regiao"], d["confianca"]) for d in piramide.detectar_monstros(frame, threshold=0.8))
+            self.assertEqual([d[:2] for d in obtido], [d[:2] for d in esperado])
+            for d_p, d_t in zip(obtido, esperado):
+                self.assertAlmostEqual(d_p[2], d_t[2], places=4)
+
+
+class DeteccaoIncrementalTest(_ComPastaSprites):
+    def setUp(self):
+        super().setUp()
+        self.sprites = {"Poring": _sprite_texturizado(self.rng, 24, 24), "Lunatic": _sprite_texturizado(self.rng, 20, 28)}
+        _criar_pasta_sprites(self.pasta, {nome: [sprite] for nome, sprite in self.sprites.items()})
+        self.fundo = cv2.GaussianBlur(self.rng.integers(0, 256, (180, 240, 3), dtype=np.uint8), (0, 0), 3)
+
+    def sequencia(self):
+        """Poring andando pela tela; Lunatic aparece no meio da sequência e some no fim."""
+        for i in range(12):
+            frame = self.fundo.copy()
+            x = 10 + 15 * i
+            frame[20:44, x:x + 24] = self.sprites["Poring"]
+            if 4 <= i < 9:
+                frame[120:140, 150:178] = self.sprites["Lunatic"]
+            yield frame
+
+    def test_incremental_igual_a_deteccao_completa(self):
+        incremental = self.criar_detector(detectar_incremental=True)
+        completo = self.criar_detector(detectar_incremental=False)
+        for i, frame in enumerate(self.sequencia()):
+            esperado = sorted((d["nome"], d["regiao"]) for d in completo.detectar_monstros(frame, threshold=0.8))
+            obtido = sorted((d["nome"], d["regiao"]) for d in incremental.detectar_monstros(frame, threshold=0.8))
+            with self.subTest(frame=i):
+                self.assertEqual(obtido, esperado)
+                self.assertIn("Poring", [nome for nome, _ in esperado])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,154 @@
+import contextlib
+import gc
+import io
+import threading
+import unittest
+from unittest import mock
+
+import numpy as np
+
+try:
+    import screen_capture
+except ImportError: # mss/dxcam/pygetwindow ausentes (ex.: fora do Windows)
+    screen_capture = None
+
+
+if screen_capture is not None:
+    class _CapturadorFalso(screen_capture.ScreenCapturerBase):
+        """Capturador sem tela: cada frame é preenchido com o número do frame (mod 256)."""
+
+        def __init__(self):
+            super().__init__(target_fps=200)
+            self.contador = 0
+
+        def start(self):
+            super().start()
+
+        def stop(self):
+            super().stop()
+
+        def set_region(self, x, y, width, height):
+            super().set_region(x, y, width, height)
+
+        def capture_frame(self, region=None):
+            self.contador += 1
+            return np.full((self.region["height"], self.region["width"], 3), self.contador % 256, dtype=np.uint8)
+
+    class _CapturadorPorThread(_CapturadorFalso):
+        """Como o mss 9: o handle fica num threading.local preenchido em start()."""
+
+        def __init__(self):
+            super().__init__()
+            self._local = threading.local()
+            self.threads_de_captura = set()
+
+        def start(self):
+            self._local.handle = object()
+            super().start()
+
+        def stop(self):
+            self._local.__dict__.pop("handle", None)
+            super().stop()
+
+        def capture_frame(self, region=None):
+            getattr(self._local, "handle") # AttributeError fora da thread que chamou start()
+            self.threads_de_captura.add(threading.get_ident())
+            return super().capture_frame(region)
+
+
+@unittest.skipIf(screen_capture is None, "screen_capture precisa de mss, dxcam e pygetwindow")
+class ThreadedCapturerTest(unittest.TestCase):
+    def setUp(self):
+        self.capturer = _CapturadorPorThread()
+        self.capturer.set_region(0, 0, 32, 24)
+        self.captura = screen_capture.ThreadedCapturer(self.capturer, timeout=5.0)
+        self.addCleanup(self.captura.stop)
+
+    def test_capturador_interno_iniciado_na_thread_de_captura(self):
+        self.capturer.start() # Iniciado na thread do chamador, como antes
+        self.captura.start()
+        self.assertTrue(self.captura.is_running())
+        self.assertIsNotNone(self.captura.capture_frame())
+        self.assertEqual(self.capturer.threads_de_captura, {self.captura._thread.ident})
+        self.captura.stop()
+        self.assertFalse(self.capturer.is_running())
+
+    def test_set_region_com_a_captura_rodando(self):
+        self.captura.start()
+        self.captura.set_region(0, 0, 16, 8)
+        self.assertEqual(self.captura.region["width"], 16)
+        frame = self.captura.capture_frame()
+        while frame is not None and frame.shape[:2] != (8, 16):
+            frame = self.captura.capture_frame()
+        self.assertIsNotNone(frame)
+
+    def test_regiao_recortada_do_frame_mais_recente(self):
+        self.captura.set_region(100, 50, 32, 24)
+        self.captura.start()
+        recorte = self.captura.capture_frame((110, 60, 8, 4))
+        self.assertEqual(recorte.shape, (4, 8, 3))
+        partes = self.captura.capture_frames_multi([(100, 50, 4, 4), (128, 70, 4, 4)])
+        self.assertEqual([p.shape for p in partes], [(4, 4, 3), (4, 4, 3)])
+        self.assertIs(partes[0].base, partes[1].base) # Views do mesmo frame
+        self.assertIsNone(self.captura.capture_frame((90, 50, 8, 4))) # Fora da região capturada
+        self.assertEqual(self.capturer.threads_de_captura, {self.captura._thread.ident})
+
+
+@unittest.skipIf(screen_capture is None, "screen_capture precisa de mss, dxcam e pygetwindow")
+class WGCJanelaTest(unittest.TestCase):
+    JANELAS = [(11, "Ragnarok", (0, 0, 800, 600)), (12, "Ragnarok - Bloco de notas", (0, 0, 400, 300)),
+               (13, "Ragnarok", (0, 0, 800, 600))]
+
+    def setUp(self):
+        for nome, valor in (("list_windows", lambda: self.JANELAS),
+                            ("get_window_title", lambda hwnd: dict((h, t) for h, t, _ in self.JANELAS)[hwnd])):
+            patcher = mock.patch.object(screen_capture, nome, valor)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_titulo_exato_com_varias_janelas(self):
+        saida = io.StringIO()
+        with contextlib.redirect_stdout(saida):
+            hwnd = screen_capture.WGCCapturer._resolver_titulo("Ragnarok")
+        self.assertEqual(hwnd, 11)
+        self.assertIn("2 janelas", saida.getvalue())
+
+    def test_hwnd_passado_quando_suportado(self):
+        with mock.patch.object(screen_capture, "WindowsCapture") as classe:
+            screen_capture.WGCCapturer._criar_captura_janela(12)
+        classe.assert_called_once_with(cursor_capture=False, draw_border=False, window_hwnd=12)
+
+    def test_titulo_por_substring_avisa_sobre_outras_janelas(self):
+        chamadas = []
+
+        def windows_capture(cursor_capture, draw_border, window_name=None):
+            chamadas.append(window_name)
+
+        saida = io.StringIO()
+        with mock.patch.object(screen_capture, "WindowsCapture", windows_capture), contextlib.redirect_stdout(saida):
+            screen_capture.WGCCapturer._criar_captura_janela(11)
+        self.assertEqual(chamadas, ["Ragnarok"])
+        self.assertIn("2 outra(s)", saida.getvalue())
+
+
+@unittest.skipIf(screen_capture is None, "screen_capture precisa de mss, dxcam e pygetwindow")
+class ProcessCapturerTest(unittest.TestCase):
+    def test_frame_legivel_depois_de_stop(self):
+        capturer = _CapturadorFalso()
+        capturer.set_region(0, 0, 64, 48)
+        captura = screen_capture.ProcessCapturer(capturer, timeout=10.0)
+        captura.start()
+        try:
+            frame = captura.capture_frame()
+        finally:
+            captura.stop()
+        self.assertIsNotNone(frame)
+        valor = frame[0, 0, 0]
+        # Antes, stop() desmapeava a memória compartilhada e esta leitura derrubava o processo
+        gc.collect()
+        self.assertTrue((frame == valor).all())
+        self.assertIsNone(captura.capture_frame())
+
+
+if __name__ == "__main__":
+    unittest.main()